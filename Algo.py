@@ -1,12 +1,30 @@
 from collections import Counter
 import random
-from typing import Callable, List, Tuple
-from copy import deepcopy
+import time
+from typing import Callable, List, NamedTuple, Tuple
+
+from geometry import geometry
+from ordering import MoveOrdering
+from parallel import searchRootParallel
+from transposition import EXACT, LOWER, UPPER, MAXIMIZER, TURN, TranspositionTable, zobristTable
+from weights import loadWeights
 
 Board = List[List[int]]
 Pos = Tuple[int, int]
 Poss = List[Pos]
 Moves = List[Tuple[Pos, Poss]]
+# the squares visited by a whole turn: a step, or every jump of a capture sequence
+Path = Tuple[Pos, ...]
+
+
+class Snapshot(NamedTuple):
+    """Immutable, hashable game state for histories and caches"""
+    # the board packed by Checkers.pack, one byte per playable square
+    board: bytes
+    # the side to move
+    player: int
+    # moves without capture, for the draw rule
+    cnt: int = 0
 
 
 class Checkers(object):
@@ -27,6 +45,31 @@ class Checkers(object):
     
     OO = 10 ** 9
 
+    # score of a tablebase win, above any evaluation
+    TB_WIN = 10 ** 6
+
+    # depth cap of iterative deepening when searching on a time budget
+    MAX_ITERATIVE_DEPTH = 64
+
+    # search algorithms of minimaxPlay: alpha-beta minimax, or principal variation search
+    ALGORITHMS = ("minimax", "pvs")
+    # half width of the first aspiration window of an iteration (pvs), in evaluate2 units
+    ASPIRATION_WINDOW = 100
+
+    # weights of the evaluate2 features (weights.FEATURES), from the weight file if there is one
+    EVAL_WEIGHTS = loadWeights()
+
+    # score of a position repeated during a search: the side repeating it can keep
+    # repeating it until the no-capture draw
+    DRAW = 0
+    # positions kept in the game history (stateCounter)
+    HISTORY_LIMIT = 256
+
+    # the transposition table is the search cache kept across searches: its memory cap
+    # (2 ** TT_BITS buckets of two entries), and the searches an unused entry survives
+    TT_BITS = 16
+    TT_MAX_AGE = 64
+
     def __init__(self, size: int = 8):
         """Initial board.
         
@@ -35,7 +78,9 @@ class Checkers(object):
         """
 
         self.size = size
-        self.board = []
+        self.geo = geometry(size)
+        self.zobrist = zobristTable(size)
+        board = []
         piece = self.WHITE_MAN
         for i in range(size):
             l = []
@@ -50,9 +95,32 @@ class Checkers(object):
                 else:
                     l.append(0)
                 f = not f
-            self.board.append(l)
-
+            board.append(l)
+        self.tablebase = None
+        self.book = None
+        self.stats = None
+        self.quiescence = False
+        self.board = board
+        self.boardChanged()
+
+        # occurrences of the positions of the game (hash with the side to move) since
+        # its last irreversible turn, see remember
         self.stateCounter = Counter()
+        # positions of the game history and of the line being searched, see searchRoot
+        self.line = set()
+        self.tt = TranspositionTable(self.TT_BITS, self.TT_MAX_AGE)
+        self.ordering = MoveOrdering(size)
+        # wall-clock deadline of the running search (None: no limit)
+        self.deadline = None
+        # root-parallel search (see parallel.py): callable returning the best root score any
+        # process has found, from the maximizer's side; read between the moves of the top
+        # node when the minimizer is to move there
+        self.sharedAlpha = None
+        self.stopped = False
+        # nodes visited by minimax and by its quiescence search, and the steps played by the last minimaxPlay
+        self.nodes = 0
+        self.qnodes = 0
+        self.lastMove = []
 
     def printBoard(self, x: int = None, y: int = None):
         """Print the game board.
@@ -79,14 +147,111 @@ class Checkers(object):
         :return: int: the value of the encoded game board
         """
         value = 0
+        board = self.board
         for i in range(self.size):
             for j in range(self.size):
                 # make the minimum value = 5, 
                 # so that it's greater than greatest value of the board (4)
                 num = i * self.size + j + 5
-                value += num * self.board[i][j]
+                value += num * board[i][j]
+        return value
+
+    def computeHash(self) -> int:
+        """Compute the zobrist hash of the game board from scratch,
+        playMove and undoMove keep self.hash up to date afterwards
+
+        :return: int: the hash of the game board
+        """
+        value = 0
+        board = self.board
+        for i in range(self.size):
+            for j in range(self.size):
+                value ^= self.zobrist[i][j][board[i][j]]
         return value
 
+    def boardChanged(self):
+        """Recompute the state derived from the board after it was replaced"""
+        self.hash = self.computeHash()
+        self.pieces = sum(1 for row in self.board for piece in row if piece != 0)
+
+    def enableQuiescence(self, enable: bool = True):
+        """Resolve pending captures at the horizon before evaluating, see quiesce()
+
+        :param: enable: turn the quiescence search on or off
+        """
+        self.quiescence = enable
+
+    def useTablebase(self, tablebase):
+        """Look positions with few pieces up in an endgame tablebase during the search
+
+        :param: tablebase: a tablebase.Tablebase of this board size, or None
+        """
+        if tablebase is not None and tablebase.size != self.size:
+            raise ValueError(f"tablebase of board size {tablebase.size}, not {self.size}")
+        self.tablebase = tablebase
+
+    def useStats(self, stats):
+        """Record search statistics
+
+        :param: stats: a stats.SearchStats filled by every following search, or None
+        """
+        for name in ("nextMoves", "playMove", "undoMove"):
+            self.__dict__.pop(name, None)
+            if stats is not None:
+                # instance attributes shadow the methods, nothing is wrapped without stats
+                setattr(self, name, stats.timed(name, getattr(self, name)))
+        self.stats = stats
+
+    def stop(self):
+        """Stop the running search (e.g. from another thread), minimax returns at once
+        and the result of the search must be thrown away"""
+        self.stopped = True
+
+    def expectedMove(self, player: int, maximizer: int):
+        """Get the best move the last search found for the current position
+
+        :param: player: the side to move ; maximizer: the maximizer of that search
+        :return: Path or None if the position was not searched
+        """
+        entry = self.tt.probe(self.hash ^ TURN[player] ^ MAXIMIZER[maximizer])
+        return None if entry is None else entry[4]
+
+    def searchContext(self, evaluate: Callable[[int], int]) -> Tuple:
+        """Get what the scores of a search depend on, the context of the transposition table
+        (see TranspositionTable.newSearch), JSON serialisable so the table can be saved
+
+        :param: evaluate: the evaluation function of the search
+        :return: tuple: board size, evaluation function, quiescence, the max pieces of the
+            tablebase (None without one) and evaluation weights
+        """
+        tablebase = None if self.tablebase is None else self.tablebase.maxPieces
+        return (self.size, evaluate.__name__, self.quiescence, tablebase) + self.EVAL_WEIGHTS
+
+    def useBook(self, book):
+        """Play from an opening book before searching
+
+        :param: book: a book.OpeningBook of this board size, or None
+        """
+        if book is not None and book.size != self.size:
+            raise ValueError(f"opening book of board size {book.size}, not {self.size}")
+        self.book = book
+
+    def tablebaseScore(self, result: int, distance: int, player: int, maximizer: int, depth: int) -> int:
+        """Score of a tablebase result for the maximizer,
+        wins beat any evaluation, faster wins and slower losses score higher
+
+        :param: result, distance: the tablebase result for the side to move (1 win,
+                -1 loss, 0 draw) and its distance in turns ; player: the side to move ; maximizer: the
+                maximizer player ; depth: the depth of the position in the search
+        :return: int: the score
+        """
+        if result == 0:
+            return 0
+        score = self.TB_WIN - depth - distance
+        if (result == 1) != (player == maximizer):
+            score = -score
+        return score
+
     def isValid(self, x: int, y: int):
         """Check if the given position is inside the board
 
@@ -100,14 +265,51 @@ class Checkers(object):
 
         :return: Board: game board
         """
-        return deepcopy(self.board)
+        return [list(row) for row in self.board]
 
     def setBoard(self, board: Board):
         """Set game board
 
         :param: board: board to set the game borad to
         """
-        self.board = deepcopy(board)
+        self.board = [list(row) for row in board]
+        self.boardChanged()
+
+    def snapshot(self, player: int, cnt: int = 0) -> Snapshot:
+        """Get a compact copy of the game state, see restore()
+
+        :param: player: the side to move ; cnt: moves without capture
+        :return: Snapshot: the packed state
+        """
+        return Snapshot(self.pack(), player, cnt)
+
+    def restore(self, snapshot: Snapshot):
+        """Set game board from a snapshot
+
+        :param: snapshot: a Snapshot of a game of the same size
+        :return: (int, int): the side to move and the moves without capture of the snapshot
+        """
+        self.unpack(snapshot.board)
+        return snapshot.player, snapshot.cnt
+
+    def pack(self) -> bytes:
+        """Pack the game board into one byte per playable square
+
+        :return: bytes: the packed board
+        """
+        board = self.board
+        return bytes(board[i][j] for i, j in self.geo.coords)
+
+    def unpack(self, data: bytes):
+        """Set game board from a board packed by pack()
+
+        :param: data: the packed board
+        """
+        board = [[0] * self.size for _ in range(self.size)]
+        for (i, j), piece in zip(self.geo.coords, data):
+            board[i][j] = piece
+        self.board = board
+        self.boardChanged()
 
     def nextPoss(self, x: int, y: int):
         """Get the possible next positions for a given position
@@ -116,26 +318,21 @@ class Checkers(object):
                y : y position
         :return:(Positions, Positions): next normal positions, next capture positions
         """
-        if self.board[x][y] == 0:
+        board = self.board
+        piece = board[x][y]
+        if piece == 0:
             return []
 
-        player = self.board[x][y] % 2
+        opponent = 1 - piece % 2
         captureMoves = []
         normalMoves = []
-        sign = 1 if player == self.WHITE else -1
         # only forward for men and both forward and backward for Kings
-        rng = 2 if self.board[x][y] <= 2 else 4
-        for i in range(rng):
-            nx = x + sign * self.DX[i]
-            ny = y + sign * self.DY[i]
-            if self.isValid(nx, ny):
-                if self.board[nx][ny] == 0:
-                    normalMoves.append((nx, ny))
-                elif self.board[nx][ny] % 2 == 1 - player:
-                    nx += sign * self.DX[i]
-                    ny += sign * self.DY[i]
-                    if self.isValid(nx, ny) and self.board[nx][ny] == 0:
-                        captureMoves.append((nx, ny))
+        for (nx, ny), landing in self.geo.reach[piece][x][y]:
+            target = board[nx][ny]
+            if target == 0:
+                normalMoves.append((nx, ny))
+            elif target % 2 == opponent and landing is not None and board[landing[0]][landing[1]] == 0:
+                captureMoves.append(landing)
 
         return normalMoves, captureMoves
 
@@ -147,18 +344,69 @@ class Checkers(object):
         """
         captureMoves = []
         normalMoves = []
-        for x in range(self.size):
-            for y in range(self.size):
-                if self.board[x][y] != 0 and self.board[x][y] % 2 == player:
-                    normal, capture = self.nextPoss(x, y)
-                    if len(normal) != 0:
-                        normalMoves.append(((x, y), normal))
-                    if len(capture) != 0:
-                        captureMoves.append(((x, y), capture))
+        board = self.board
+        for x, y in self.geo.coords:
+            if board[x][y] != 0 and board[x][y] % 2 == player:
+                normal, capture = self.nextPoss(x, y)
+                if len(normal) != 0:
+                    normalMoves.append(((x, y), normal))
+                if len(capture) != 0:
+                    captureMoves.append(((x, y), capture))
         if len(captureMoves) != 0:
             return captureMoves
         return normalMoves
 
+    def nextPaths(self, player: int) -> List[Path]:
+        """Get the complete turns of a player, capture sequences followed to their end
+
+        :param: player (int): the type of player (WHITE, BLACK)
+        :return: List[Path]: one path per turn, a capture sequence that branches
+            gives one path per branch
+        """
+        paths = []
+        for (x, y), poss in self.nextMoves(player):
+            for nx, ny in poss:
+                if abs(nx - x) == 2:
+                    self._jumpPaths(((x, y), (nx, ny)), paths)
+                else:
+                    paths.append(((x, y), (nx, ny)))
+        return paths
+
+    def _jumpPaths(self, path: Path, paths: List[Path]):
+        """Append the capture sequences starting with path to paths"""
+        (x, y), (nx, ny) = path[-2], path[-1]
+        canCapture, removed, promoted = self.playMove(x, y, nx, ny)
+        captures = self.nextPoss(nx, ny)[1] if canCapture else []
+        if len(captures) == 0:
+            paths.append(path)
+        for cx, cy in captures:
+            self._jumpPaths(path + ((cx, cy),), paths)
+        self.undoMove(x, y, nx, ny, removed, promoted)
+
+    def playPath(self, path: Path):
+        """Play a whole turn
+
+        :param: path: a path from nextPaths
+        :return: List[(int, bool)]: removed piece and promotion of every step, for undoPath
+        """
+        steps = []
+        x, y = path[0]
+        for nx, ny in path[1:]:
+            _, removed, promoted = self.playMove(x, y, nx, ny)
+            steps.append((removed, promoted))
+            x, y = nx, ny
+        return steps
+
+    def undoPath(self, path: Path, steps):
+        """Undo a turn played by playPath
+
+        :param: path: the path ; steps: what playPath returned
+        """
+        for i in range(len(steps) - 1, -1, -1):
+            (x, y), (nx, ny) = path[i], path[i + 1]
+            removed, promoted = steps[i]
+            self.undoMove(x, y, nx, ny, removed, promoted)
+
     def playMove(self, x: int, y: int, nx: int, ny: int):
         """Change the board by playing a move from (x, y) to (nx, ny)
 
@@ -167,53 +415,60 @@ class Checkers(object):
                  removed (int): the removed piece.  
                  whetherking (bool) if the current piece is king.  
         """
-        self.board[nx][ny] = self.board[x][y]
+        piece = self.board[x][y]
+        self.board[nx][ny] = piece
         self.board[x][y] = 0
+        self.hash ^= self.zobrist[x][y][piece] ^ self.zobrist[nx][ny][piece]
 
         removed = 0
+        promoted = False
         if abs(nx - x) == 2:  # capture move
             dx = nx - x
             dy = ny - y
             removed = self.board[x + dx // 2][y + dy // 2]
             # remove captured piece
             self.board[x + dx // 2][y + dy // 2] = 0
-            # if king is removed
-            if removed == self.WHITE_KING: 
-                return False, removed, False
-            if removed == self.BLACK_KING:
-                return False, removed, False
-            
-        # become king
-        if self.board[nx][ny] == self.WHITE_MAN and nx == self.size - 1:
-            self.board[nx][ny] = self.WHITE_KING
-            return False, removed, True
-        if self.board[nx][ny] == self.BLACK_MAN and nx == 0:
-            self.board[nx][ny] = self.BLACK_KING
-            return False, removed, True
-
-        if abs(nx - x) != 2:
-            return False, removed, False
-
-        return True, removed, False
+            self.hash ^= self.zobrist[x + dx // 2][y + dy // 2][removed]
+            self.pieces -= 1
+
+        # become king, unless a king was removed
+        if removed != self.WHITE_KING and removed != self.BLACK_KING:
+            if piece == self.WHITE_MAN and nx == self.size - 1:
+                self.board[nx][ny] = self.WHITE_KING
+                promoted = True
+            if piece == self.BLACK_MAN and nx == 0:
+                self.board[nx][ny] = self.BLACK_KING
+                promoted = True
+            if promoted:
+                self.hash ^= self.zobrist[nx][ny][piece] ^ self.zobrist[nx][ny][piece + 2]
+
+        canCapture = removed != 0 and removed != self.WHITE_KING and removed != self.BLACK_KING and not promoted
+        return canCapture, removed, promoted
 
     def undoMove(self, x: int, y: int, nx: int, ny: int, removed=0, promoted=False):
         """Undo a move and return the board to its previous state
 
         """
         if promoted:
+            king = self.board[nx][ny]
             if self.board[nx][ny] == self.WHITE_KING:
                 self.board[nx][ny] = self.WHITE_MAN
 
             if self.board[nx][ny] == self.BLACK_KING:
                 self.board[nx][ny] = self.BLACK_MAN
+            self.hash ^= self.zobrist[nx][ny][king] ^ self.zobrist[nx][ny][self.board[nx][ny]]
 
-        self.board[x][y] = self.board[nx][ny]
+        piece = self.board[nx][ny]
+        self.board[x][y] = piece
         self.board[nx][ny] = 0
+        self.hash ^= self.zobrist[x][y][piece] ^ self.zobrist[nx][ny][piece]
 
         if abs(nx - x) == 2:
             dx = nx - x
             dy = ny - y
             self.board[x + dx // 2][y + dy // 2] = removed
+            self.hash ^= self.zobrist[x + dx // 2][y + dy // 2][removed]
+            self.pieces += 1
 
 
     def cellContains(self, x: int, y: int, player: int) -> bool:
@@ -228,9 +483,37 @@ class Checkers(object):
         """
         return self.board[x][y] != 0 and self.board[x][y] % 2 == player
 
+    def pieceAt(self, b: int) -> int:
+        """Get the piece on square b
+
+        :param: b: square index, see geometry
+        :return: int: the piece (0 if the square is empty)
+        """
+        i, j = self.geo.coords[b]
+        return self.board[i][j]
+
+    def material(self) -> Tuple[int, int, int, int]:
+        """Count the pieces on the board
+
+        :return: (int, int, int, int): white men, white kings, black men, black kings
+        """
+        counts = [0] * 5
+        board = self.board
+        for i, j in self.geo.coords:
+            counts[board[i][j]] += 1
+        return counts[self.WHITE_MAN], counts[self.WHITE_KING], counts[self.BLACK_MAN], counts[self.BLACK_KING]
+
     def endGame(self, maximizer: int) -> int:
         """evaluate the current state of the board based on end game strategies
-            between maximizer player and the opponent
+            between maximizer player and the opponent, with the backend's fullEndGame
+
+        :param:maximizer (int): the type of the maximizer player (WHITE, BLACK)
+        :return: score of the board
+        """
+        return self.fullEndGame(maximizer)
+
+    def fullEndGame(self, maximizer: int) -> int:
+        """endGame by scanning every cell
 
         :param:maximizer (int): the type of the maximizer player (WHITE, BLACK)
         :return: score of the board
@@ -241,39 +524,36 @@ class Checkers(object):
         minPieces = 0
         rowScore = 0
         base = 0 if maximizer == self.WHITE else self.size-1
-        minimizer = 1 - maximizer
-        minimizerPoss = []
-        for x in range(self.size):
-            for y in range(self.size):
-                if self.cellContains(x, y, minimizer):
-                    minimizerPoss.append((x, y))
+        geo = self.geo
+        board = self.board
+        maximizerSquares = []
+        minimizerSquares = []
+        maximizerMask = 0
+        minimizerMask = 0
+        for b, (i, j) in enumerate(geo.coords):
+            piece = board[i][j]
+            if piece != 0:
+                if piece % 2 == maximizer:
+                    maxPieces += 1
+                    maximizerSquares.append(b)
+                    maximizerMask |= 1 << b
+                    if piece <= 2:
+                        rowScore += abs(base-i)
+                    score1 += (piece + 1) // 2
+                else:
+                    minPieces += 1
+                    minimizerSquares.append(b)
+                    minimizerMask |= 1 << b
+                    score1 -= (piece + 1) // 2
 
-        for i in range(self.size):
-            for j in range(self.size):
-                if self.board[i][j] != 0:
-                    if self.board[i][j] % 2 == maximizer:
-                        maxPieces += 1
-                        if (self.board[i][j] + 1) // 2 == 1:
-                            rowScore += abs(base-i)
-                        score1 += (self.board[i][j] + 1) // 2
-                        for x,y in minimizerPoss:
-                            score2 += (x-i)**2 + (y-j)**2
-                    else:
-                        minPieces += 1
-                        score1 -= (self.board[i][j] + 1) // 2
+        for b in maximizerSquares:
+            distance = geo.distance[b]
+            for m in minimizerSquares:
+                score2 += distance[m]
 
         # penalize if the minimizer is in the corner to be able to trap him at the end of the game                   
-        minimizerCorner = 0
-        for x, y in minimizerPoss:
-            if (x,y) == (0, 1) or (x,y) == (1, 0) or (x, y) == (self.size-1, self.size-2) \
-                or (x,y) == (self.size-2, self.size-1):
-                minimizerCorner = 1
-
-        maximizerCorner = 0
-        if self.cellContains(0, 1, maximizer) or self.cellContains(1, 0, maximizer) \
-            or self.cellContains(self.size-1, self.size-2, maximizer) \
-            or self.cellContains(self.size-2, self.size-1, maximizer):
-            maximizerCorner = 1
+        minimizerCorner = 1 if minimizerMask & geo.corners else 0
+        maximizerCorner = 1 if maximizerMask & geo.corners else 0
 
         if maxPieces > minPieces:   #come closer to opponent
             return score1*1000 - score2 - minimizerCorner*5 + rowScore*10
@@ -281,7 +561,15 @@ class Checkers(object):
             return score1*1000 + score2 + maximizerCorner*5
 
     def evaluate2(self, maximizer: int):
-        """evaluate the current state of the board
+        """evaluate the current state of the board with the backend's fullEvaluate2
+
+        :param:maximizer (int): the type of the maximizer player (WHITE, BLACK)
+        :return:int: score of the board
+        """
+        return self.fullEvaluate2(maximizer)
+
+    def fullEvaluate2(self, maximizer: int):
+        """evaluate the current state of the board by scanning every cell
 
         :param:maximizer (int): the type of the maximizer player (WHITE, BLACK)
         :return:int: score of the board
@@ -294,65 +582,109 @@ class Checkers(object):
         middleRow = 0
         vulnerable = 0
         protected = 0
-        for i in range(self.size):
-            for j in range(self.size):
-                if self.board[i][j] != 0:
-                    sign = 1 if self.board[i][j] % 2 == maximizer else -1
-                    if self.board[i][j] <= 2:
-                        men += sign*1
-                    else:
-                        kings += sign*1
-                    if sign == 1 and ((i == 0 and maximizer == self.WHITE) or (i == self.size-1 and maximizer == self.BLACK)):
-                        backRow += 1
-                    if i == self.size/2-1 or i == self.size/2:
-                        if j >= self.size/2-2 and j < self.size/2+2:
-                            middleBox += sign*1
-                        else:
-                            middleRow += sign*1
-
-                    myDir = 1 if maximizer == self.WHITE else -1
-                    vul = False
-                    for k in range(4):
-                        x = i + self.DX[k]
-                        y = j + self.DY[k]
-                        n = i - self.DX[k]
-                        m = j - self.DY[k]
-                        opDir = abs(x-n)/(x-n)
-                        if self.isValid(x, y) and self.board[x][y] != 0 and self.board[x][y] % 2 != maximizer \
-                            and self.isValid(n, m) and self.board[n][m] == 0 and (self.board[x][y] > 2 or myDir != opDir):
-                            vul = True
-                            break
-                    
-                    if vul:
-                        vulnerable += sign*1
-                    else:
-                        protected += sign*1
-                
-        return men*2000 + kings*4000 + backRow*400 + middleBox*250 + middleRow*50 - 300*vulnerable + 300*protected
+        geo = self.geo
+        board = self.board
+        ownBackRow = geo.backRow[maximizer]
+        myDir = 1 if maximizer == self.WHITE else -1
+        for b, (i, j) in enumerate(geo.coords):
+            piece = board[i][j]
+            if piece != 0:
+                bit = 1 << b
+                sign = 1 if piece % 2 == maximizer else -1
+                if piece <= 2:
+                    men += sign*1
+                else:
+                    kings += sign*1
+                if sign == 1 and ownBackRow & bit:
+                    backRow += 1
+                if geo.middleBox & bit:
+                    middleBox += sign*1
+                elif geo.middleRow & bit:
+                    middleRow += sign*1
+
+                vul = False
+                for x, y, n, m, opDir in geo.threats[b]:
+                    attacker = board[x][y]
+                    if attacker != 0 and attacker % 2 != maximizer and board[n][m] == 0 \
+                        and (attacker > 2 or myDir != opDir):
+                        vul = True
+                        break
+
+                if vul:
+                    vulnerable += sign*1
+                else:
+                    protected += sign*1
+
+        wMen, wKings, wBackRow, wMiddleBox, wMiddleRow, wVulnerable, wProtected = self.EVAL_WEIGHTS
+        return men*wMen + kings*wKings + backRow*wBackRow + middleBox*wMiddleBox + middleRow*wMiddleRow \
+            + vulnerable*wVulnerable + protected*wProtected
 
     def stateValue(self, maximizer):
         """get value of the board state,when the maximizer's pieces is greater than the minimizer's, 
         penalize repeating the same state
 
-        :param: maximizer (int): the type of the maximizer player (WHIET/BLACK)
+        :param: maximizer (int): the type of the maximizer player (WHIET/BLACK), who just moved
         :return: int: value of the board state
         """
-        maxPieces = 0
-        minPieces = 0
-        for i in range(self.size):
-            for j in range(self.size):
-                if self.board[i][j] != 0:
-                    if self.board[i][j] % 2 == maximizer:
-                        maxPieces += 1
-                    else:
-                        minPieces += 1
+        count = self.stateCounter.get(self.hash ^ TURN[1 - maximizer], 0)
+        if count == 0:
+            return 0
+        whiteMen, whiteKings, blackMen, blackKings = self.material()
+        white, black = whiteMen + whiteKings, blackMen + blackKings
+        maxPieces, minPieces = (white, black) if maximizer == self.WHITE else (black, white)
         if (maxPieces > minPieces):
-            return -self.stateCounter[self.encodeBoard()]
+            return -count
         return 0
 
+    def remember(self, player: int, irreversible: bool = False):
+        """Count the current position in the game history
+
+        :param: player: the side to move ; irreversible: the last turn was irreversible
+            (see irreversible), the earlier positions cannot come back and are forgotten
+        """
+        history = self.stateCounter
+        if irreversible:
+            history.clear()
+        history[self.hash ^ TURN[player]] += 1
+        if len(history) > self.HISTORY_LIMIT:
+            # forget the oldest position
+            del history[next(iter(history))]
+
+    def resetHistory(self):
+        """Forget the game history, e.g. after setting up or going back to another position"""
+        self.stateCounter.clear()
+
+    def irreversible(self, path: Path, steps) -> bool:
+        """Check if a turn just played by playPath can never be undone by later turns:
+        a capture, a promotion or a man's step
+
+        :param: path: the path ; steps: what playPath returned
+        :return: bool: no earlier position can come back
+        """
+        x, y = path[-1]
+        return self.pieceAt(self.geo.index[x][y]) <= 2 or any(removed != 0 or promoted for removed, promoted in steps)
+
+    def perft(self, player: int, depth: int) -> int:
+        """Count the move paths of depth turns, a whole capture sequence being one turn
+
+        :param: player: the type of the player to move (WHITE, BLACK) ; depth: number of turns
+        :return: int: number of leaves, positions without moves before depth count 0
+        """
+        if depth == 0:
+            return 1
+        paths = self.nextPaths(player)
+        if depth == 1:
+            return len(paths)
+        count = 0
+        for path in paths:
+            steps = self.playPath(path)
+            count += self.perft(1 - player, depth - 1)
+            self.undoPath(path, steps)
+        return count
+
     def minimax(self,player: int,maximizer: int,depth: int = 0,alpha: int = -OO,beta: int = OO,
-        maxDepth: int = 4,evaluate: Callable[[int],int] = evaluate2,moves: Moves = None,):
-        """Get the score of the board using alpha-beta algorithm
+        maxDepth: int = 4,evaluate: Callable[[int],int] = evaluate2):
+        """Get the score of the board using alpha-beta algorithm, one ply per turn
 
         :param:
             player: the type of the current player (WHITE, BLACK)
@@ -362,12 +694,49 @@ class Checkers(object):
             beta: the value of beta of the algorithm. Defaults to OO.
             maxDepth: the higher the max depth, Defaults to 4.
             evaluate: evaluation function. Defaults to evaluate2
-            moves: the next capture moves (if any). Defaults to None.
         :return: int|float : score of the baord
         """
-        if moves == None:
-            moves = self.nextMoves(player)
-        if len(moves) == 0 or depth == maxDepth:
+        self.nodes += 1
+        stats = self.stats
+        if stats is not None:
+            stats.node(depth)
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stopped = True
+        if self.stopped:
+            # the result is thrown away by minimaxPlay
+            return 0
+
+        if self.tablebase is not None and self.pieces <= self.tablebase.maxPieces:
+            found = self.tablebase.probe(self, player)
+            if found is not None:
+                return self.tablebaseScore(found[0], found[1], player, maximizer, depth)
+
+        key = None
+        ttMove = None
+        if depth < maxDepth:
+            key = self.hash ^ TURN[player] ^ MAXIMIZER[maximizer]
+            entry = self.tt.probe(key)
+            if entry is not None:
+                _, ttDepth, bound, score, ttMove, _ = entry
+                if ttDepth >= maxDepth - depth:
+                    if bound == EXACT:
+                        return score
+                    if bound == LOWER:
+                        alpha = max(alpha, score)
+                    else:
+                        beta = min(beta, score)
+                    if beta <= alpha:
+                        return score
+        alphaOrig, betaOrig = alpha, beta
+
+        if depth == maxDepth and not self.quiescence:
+            # a leaf only needs to know whether there is a move at all
+            paths = self.nextMoves(player)
+        else:
+            paths = self.nextPaths(player)
+        if len(paths) != 0 and depth == maxDepth and self.quiescence:
+            return self.quiesce(player, maximizer, depth, alpha, beta, evaluate, paths)
+        if len(paths) == 0 or depth == maxDepth:
             score = evaluate(self, maximizer)
             # if there is no escape from losing, maximize number of moves to lose
             if score < 0:
@@ -377,69 +746,388 @@ class Checkers(object):
         bestValue = -self.OO
         if player != maximizer:
             bestValue = self.OO
+        bestMove = None
+
+        # sort moves by the minimum next positions of their piece, then let the
+        # transposition table move, killers and history go first
+        counts = Counter(path[0] for path in paths)
+        paths.sort(key=lambda path: counts[path[0]])
+        line = self.line
+        for i, move in enumerate(self.ordering.order(paths, depth, ttMove)):
+            if depth == 0 and player != maximizer and self.sharedAlpha is not None:
+                # a better root score found meanwhile tightens the window, the bound
+                # stored below is relative to it
+                alpha = alphaOrig = max(alpha, self.sharedAlpha())
+                if beta <= alpha:
+                    # fail low: beta is an upper bound of the score, too weak a result to store
+                    bestValue = min(bestValue, beta)
+                    key = None
+                    break
+            steps = self.playPath(move)
+            position = self.hash ^ TURN[1 - player]
+            if position in line:
+                value = self.DRAW
+            else:
+                line.add(position)
+                value = self.minimax(1 - player, maximizer, depth + 1, alpha, beta, maxDepth, evaluate)
+                line.discard(position)
+            self.undoPath(move, steps)
+
+            if player == maximizer:
+                if value > bestValue:
+                    bestValue = value
+                    bestMove = move
+                alpha = max(alpha, bestValue)
+            else:
+                if value < bestValue:
+                    bestValue = value
+                    bestMove = move
+                beta = min(beta, bestValue)
+
+            if beta <= alpha:
+                if not self.stopped:
+                    self.ordering.cutoff(move, depth, maxDepth - depth, i)
+                    if stats is not None:
+                        stats.cutoff(i)
+                break
+
+        if key is not None and not self.stopped:
+            if bestValue <= alphaOrig:
+                bound = UPPER
+            elif bestValue >= betaOrig:
+                bound = LOWER
+            else:
+                bound = EXACT
+            self.tt.store(key, maxDepth - depth, bound, bestValue, bestMove)
+
+        return bestValue
+
+    def pvs(self,player: int,maximizer: int,depth: int = 0,alpha: int = -OO,beta: int = OO,
+        maxDepth: int = 4,evaluate: Callable[[int],int] = evaluate2):
+        """Get the score of the board using principal variation search, a drop-in for minimax:
+        same arguments, same scores, from the maximizer's side
 
-        # sort moves by the minimum next positions
-        moves.sort(key=lambda move: len(move[1]))
-        for pos in moves:
-            x, y = pos[0]
-            for nx, ny in pos[1]:
-
-                canCapture, removed, promoted = self.playMove(x, y, nx, ny)
-                played = False
-
-                if canCapture:
-                    _, nextCaptures = self.nextPoss(nx, ny)
-                    if len(nextCaptures) != 0:
-                        played = True
-                        nMoves = [((nx, ny), nextCaptures)]
-                        if player == maximizer:
-                            bestValue = max(
-                                bestValue,
-                                self.minimax(player, maximizer, depth + 1, alpha, beta, maxDepth, evaluate, nMoves)
-                            )
-                            alpha = max(alpha, bestValue)
-                        else:
-                            bestValue = min(
-                                bestValue,
-                                self.minimax(player, maximizer, depth + 1, alpha, beta, maxDepth, evaluate, nMoves)
-                            )
-                            beta = min(beta, bestValue)
-
-                if not played:
-                    if player == maximizer:
-                        bestValue = max(
-                            bestValue,
-                            self.minimax(1 - player, maximizer, depth + 1, alpha, beta, maxDepth, evaluate)
-                        )
-                        alpha = max(alpha, bestValue)
+        :return: int: score of the board
+        """
+        if player == maximizer:
+            return self.negamax(player, maximizer, depth, alpha, beta, maxDepth, evaluate)
+        return -self.negamax(player, maximizer, depth, -beta, -alpha, maxDepth, evaluate)
+
+    def negamax(self, player: int, maximizer: int, depth: int, alpha: int, beta: int,
+        maxDepth: int, evaluate: Callable[[int], int]):
+        """Principal variation search in negamax form
+
+        The first move is searched with the full window, the others with a null
+        window around alpha, which only proves they are not better; a move failing
+        high is searched again with the full window. Scores are from the side to
+        move (the negated minimax score when it is the minimizer), the transposition
+        table stores them from the maximizer's side like minimax does.
+
+        :param:
+            player: the type of the current player (WHITE, BLACK)
+            maximizer: the type of the maximizer player (WHITE, BLACK)
+            depth: the current depth ; alpha, beta: the window, from the side to move
+            maxDepth: the max depth ; evaluate: evaluation function
+        :return: int: score of the board for the side to move
+        """
+        self.nodes += 1
+        stats = self.stats
+        if stats is not None:
+            stats.node(depth)
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stopped = True
+        if self.stopped:
+            return 0
+        sign = 1 if player == maximizer else -1
+
+        if self.tablebase is not None and self.pieces <= self.tablebase.maxPieces:
+            found = self.tablebase.probe(self, player)
+            if found is not None:
+                return sign * self.tablebaseScore(found[0], found[1], player, maximizer, depth)
+
+        key = None
+        ttMove = None
+        if depth < maxDepth:
+            key = self.hash ^ TURN[player] ^ MAXIMIZER[maximizer]
+            entry = self.tt.probe(key)
+            if entry is not None:
+                _, ttDepth, bound, score, ttMove, _ = entry
+                if ttDepth >= maxDepth - depth:
+                    score *= sign
+                    if bound != EXACT and sign < 0:
+                        bound = UPPER if bound == LOWER else LOWER
+                    if bound == EXACT:
+                        return score
+                    if bound == LOWER:
+                        alpha = max(alpha, score)
                     else:
-                        bestValue = min(
-                            bestValue,
-                            self.minimax(1 - player, maximizer, depth + 1, alpha, beta, maxDepth, evaluate)
-                        )
-                        beta = min(beta, bestValue)
+                        beta = min(beta, score)
+                    if beta <= alpha:
+                        return score
+        alphaOrig = alpha
+
+        if depth == maxDepth and not self.quiescence:
+            paths = self.nextMoves(player)
+        else:
+            paths = self.nextPaths(player)
+        if len(paths) != 0 and depth == maxDepth and self.quiescence:
+            if sign > 0:
+                return self.quiesce(player, maximizer, depth, alpha, beta, evaluate, paths)
+            return -self.quiesce(player, maximizer, depth, -beta, -alpha, evaluate, paths)
+        if len(paths) == 0 or depth == maxDepth:
+            score = evaluate(self, maximizer)
+            if score < 0:
+                score += depth
+            return sign * score
 
-                self.undoMove(x, y, nx, ny, removed, promoted)
+        bestValue = -self.OO
+        bestMove = None
 
+        counts = Counter(path[0] for path in paths)
+        paths.sort(key=lambda path: counts[path[0]])
+        line = self.line
+        for i, move in enumerate(self.ordering.order(paths, depth, ttMove)):
+            if depth == 0 and sign < 0 and self.sharedAlpha is not None:
+                # see minimax, the maximizer's alpha is the minimizer's beta
+                beta = min(beta, -self.sharedAlpha())
                 if beta <= alpha:
+                    bestValue = max(bestValue, alpha)
+                    key = None
                     break
+            steps = self.playPath(move)
+            position = self.hash ^ TURN[1 - player]
+            if position in line:
+                value = sign * self.DRAW
+            else:
+                line.add(position)
+                if i == 0:
+                    value = -self.negamax(1 - player, maximizer, depth + 1, -beta, -alpha, maxDepth, evaluate)
+                else:
+                    value = -self.negamax(1 - player, maximizer, depth + 1, -alpha - 1, -alpha, maxDepth, evaluate)
+                    if alpha < value < beta:
+                        value = -self.negamax(1 - player, maximizer, depth + 1, -beta, -alpha, maxDepth, evaluate)
+                line.discard(position)
+            self.undoPath(move, steps)
+
+            if value > bestValue:
+                bestValue = value
+                bestMove = move
+            alpha = max(alpha, bestValue)
+
             if beta <= alpha:
+                if not self.stopped:
+                    self.ordering.cutoff(move, depth, maxDepth - depth, i)
+                    if stats is not None:
+                        stats.cutoff(i)
                 break
 
+        if key is not None and not self.stopped:
+            if bestValue <= alphaOrig:
+                bound = UPPER if sign > 0 else LOWER
+            elif bestValue >= beta:
+                bound = LOWER if sign > 0 else UPPER
+            else:
+                bound = EXACT
+            self.tt.store(key, maxDepth - depth, bound, sign * bestValue, bestMove)
+
         return bestValue
 
-    def minimaxPlay(self,player: int,moves: Moves = None,maxDepth: int = 4,evaluate: Callable[[int], int] = evaluate2,enablePrint: bool = True):
-        """play a move using minimax algorithm
-            if the player should continue capturing, it will
+    def quiesce(self, player: int, maximizer: int, depth: int, alpha: int, beta: int,
+        evaluate: Callable[[int], int], paths: List[Path]):
+        """Get the score of a horizon position, following captures until the position is quiet
+
+        Captures are compulsory, so the side to move may only stand pat (take the
+        static evaluation) when it has no capture; otherwise every capture is
+        searched with alpha-beta. Capture sequences are finite, no depth limit is needed.
+
+        :param:
+            player: the type of the current player (WHITE, BLACK)
+            maximizer: the type of the maximizer player (WHITE, BLACK)
+            depth: the current depth ; alpha, beta: the search window
+            evaluate: evaluation function
+            paths: the turns of the side to move
+        :return: int: score of the board
+        """
+        self.qnodes += 1
+        if self.stats is not None:
+            self.stats.qnode()
+        if self.stopped:
+            return 0
+
+        if len(paths) == 0 or abs(paths[0][1][0] - paths[0][0][0]) != 2:
+            # stand pat
+            score = evaluate(self, maximizer)
+            if score < 0:
+                score += depth
+            return score
+
+        bestValue = -self.OO if player == maximizer else self.OO
+        for path in paths:
+            steps = self.playPath(path)
+            value = self.quiesce(1 - player, maximizer, depth + 1, alpha, beta, evaluate, self.nextPaths(1 - player))
+            self.undoPath(path, steps)
+
+            if player == maximizer:
+                bestValue = max(bestValue, value)
+                alpha = max(alpha, bestValue)
+            else:
+                bestValue = min(bestValue, value)
+                beta = min(beta, bestValue)
+            if beta <= alpha:
+                return bestValue
+        return bestValue
+
+    def searchRoot(self, player: int, moves: List[Path], maxDepth: int, evaluate: Callable[[int], int],
+        first: Path = None, workers: int = None, algorithm: str = "minimax", alpha: int = -OO, beta: int = OO):
+        """Score every root move with minimax and pick the best one
+
+        :param:
+            player: the type of the player (WHITE, BLACK)
+            moves: the root paths, ties in move ordering keep this order
+            maxDepth: the max depth of the minimax algorithm
+            evaluate: evaluation function
+            first: a path to search first. Defaults to None
+            workers: if greater than 1, split the root moves across this many
+                processes, see parallel.searchRootParallel. Defaults to None
+            algorithm: "minimax" or "pvs", see ALGORITHMS. Defaults to "minimax"
+            alpha, beta: the root window (aspiration), the best score is only
+                exact inside it. Ignored by the parallel search. Defaults to (-OO, OO)
+        :return: (int, Path): best score and best path
+        """
+        # positions that score as a draw when the search reaches them again
+        self.line = set(self.stateCounter)
+        self.line.add(self.hash ^ TURN[player])
+        ordered = self.ordering.order(moves, None, first)
+        if workers is not None and workers > 1:
+            return searchRootParallel(self, player, ordered, maxDepth, evaluate, workers, algorithm)
+        if self.stats is not None:
+            evaluate = self.stats.timed("evaluate", evaluate)
+        pvs = algorithm == "pvs"
+        search = self.pvs if pvs else self.minimax
+
+        bestValue = -self.OO
+        bestMove = None
+
+        for move in ordered:
+            steps = self.playPath(move)
+            penalty = 2*self.stateValue(player)
+            # only a move scoring above the best so far can replace it,
+            # so the best score is a lower bound for the rest
+            low = max(alpha, bestValue) - penalty
+            position = self.hash ^ TURN[1 - player]
+            if position in self.line:
+                value = self.DRAW
+            else:
+                self.line.add(position)
+                if pvs and bestMove is not None:
+                    # a null window proves the move is no better, search it again if it is
+                    value = search(1 - player, player, alpha=low, beta=low + 1, maxDepth=maxDepth, evaluate=evaluate)
+                    if low < value < beta - penalty:
+                        value = search(1 - player, player, alpha=low, beta=beta - penalty, maxDepth=maxDepth,
+                            evaluate=evaluate)
+                else:
+                    value = search(1 - player, player, alpha=low, beta=beta - penalty, maxDepth=maxDepth,
+                        evaluate=evaluate)
+                self.line.discard(position)
+            value += penalty
+            self.undoPath(move, steps)
+            if value > bestValue:
+                bestValue = value
+                bestMove = move
+            if bestValue >= beta:
+                break
+        return bestValue, bestMove
+
+    def iterativeDeepening(self, player: int, moves: List[Path], timeLimit: float, evaluate: Callable[[int], int],
+        maxDepth: int = MAX_ITERATIVE_DEPTH, workers: int = None, algorithm: str = "minimax"):
+        """Search depth 1, 2, 3, ... until the time budget runs out
+
+        Every iteration searches the best move of the previous one first, and the
+        transposition table orders the rest of the previous principal variation.
+        With pvs, an iteration first searches a window of ASPIRATION_WINDOW around
+        the previous score, and widens it on the side the score falls out of.
+
+        :param:
+            player: the type of the player (WHITE, BLACK)
+            moves: the root paths
+            timeLimit: wall-clock budget in seconds
+            evaluate: evaluation function
+            maxDepth: the deepest iteration. Defaults to MAX_ITERATIVE_DEPTH
+            workers: number of search processes, see searchRoot. Defaults to None
+            algorithm: "minimax" or "pvs", see ALGORITHMS. Defaults to "minimax"
+        :return: (int, Path, int): score and best path of the last
+            completed iteration, and its depth
+        """
+        bestValue, bestMove, depth = -self.OO, None, 0
+        # self.stopped is not cleared here: another thread may already have stopped the search
+        self.deadline = time.perf_counter() + timeLimit
+        try:
+            for d in range(1, maxDepth + 1):
+                if algorithm == "pvs" and bestMove is not None and (workers is None or workers <= 1):
+                    value, move = self.aspirationSearch(player, moves, d, evaluate, bestMove, bestValue)
+                else:
+                    value, move = self.searchRoot(player, moves, d, evaluate, bestMove, workers, algorithm)
+                if self.stopped:
+                    break
+                bestValue, bestMove, depth = value, move, d
+        finally:
+            self.deadline = None
+            self.stopped = False
+
+        if bestMove is None:
+            # not even depth 1 finished, play the first move
+            bestMove = moves[0]
+        return bestValue, bestMove, depth
+
+    def aspirationSearch(self, player: int, moves: List[Path], maxDepth: int, evaluate: Callable[[int], int],
+        first: Path, guess: int):
+        """Search the root with pvs in a window around a guessed score, widening it until the score falls inside
+
+        :param:
+            player: the type of the player (WHITE, BLACK)
+            moves: the root paths ; maxDepth: the max depth ; evaluate: evaluation function
+            first: a path to search first ; guess: the expected score, e.g. of the previous iteration
+        :return: (int, Path): best score and best path
+        """
+        delta = self.ASPIRATION_WINDOW
+        alpha, beta = guess - delta, guess + delta
+        while True:
+            value, move = self.searchRoot(player, moves, maxDepth, evaluate, first, algorithm="pvs",
+                alpha=alpha, beta=beta)
+            if self.stopped or alpha < value < beta:
+                return value, move
+            delta *= 4
+            if value <= alpha:
+                alpha = max(value - delta, -self.OO)
+            else:
+                beta = min(value + delta, self.OO)
+                # the move that failed high goes first next time
+                first = move
+
+    def minimaxPlay(self,player: int,moves: List[Path] = None,maxDepth: int = 4,evaluate: Callable[[int], int] = evaluate2,enablePrint: bool = True,
+        timeLimit: float = None,workers: int = None,algorithm: str = "minimax"):
+        """play a turn using minimax algorithm
+            a capture sequence is played to its end.
+            Book moves (see useBook) are played without searching.
+            The transposition table is kept from one call to the next (see TT_BITS).
 
         Args:
             player (int): the type of the player (WHITE, BLACK)
-            moves (Moves, optional): the next capture moves (if any). Defaults to None.
+            moves (List[Path], optional): the turns to choose from. Defaults to every turn.
             maxDepth (int, optional): the max depth of the minimax algorithm
                 the higher the max depth, the harder the level of th play 
                 and the more time the algorithm will take. Defaults to 4.
             enablePrint (bool, optional): if true it prints the game board 
                 to stdout after playing the move. Defaults to True.
+            timeLimit (float, optional): if given, search with iterative deepening
+                until this many seconds have passed instead of to maxDepth.
+                Defaults to None.
+            workers (int, optional): if greater than 1, search the root moves in
+                parallel on this many processes. Picks the same move as the
+                serial search at the same depth. Defaults to None.
+            algorithm (str, optional): "minimax" for alpha-beta, or "pvs" for principal
+                variation search (null windows, aspiration windows with a time limit);
+                both score the moves the same. Defaults to "minimax".
 
         :return:
             continue (bool): false if there is no further plays.  
@@ -447,42 +1135,60 @@ class Checkers(object):
                 used to reset the counter of the draw condition.
         """
 
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"unknown search algorithm: {algorithm}")
         if moves == None:
-            moves = self.nextMoves(player)
+            moves = self.nextPaths(player)
+        self.lastMove = []
         if len(moves) == 0:
             if enablePrint:
                 print(("WHITE" if player == self.BLACK else "BLACK") + " Player wins")
             return False, False
-
-        self.stateCounter[self.encodeBoard()] += 1
+        bookMove = None
+        if self.book is not None:
+            step = self.book.choose(self, player, moves)
+            if step is not None:
+                # the book knows the first step of a turn, search between the
+                # capture sequences starting with it if there are several
+                moves = [path for path in moves if path[0] + path[1] == step]
+                if len(moves) == 1:
+                    bookMove = moves[0]
+
+        self.remember(player)
+        self.tt.newSearch(self.searchContext(evaluate))
+        self.ordering.newSearch()
 
         random.shuffle(moves)
-        bestValue = -self.OO
-        bestMove = None
-
-        for pos in moves:
-            x, y = pos[0]
-            for nx, ny in pos[1]:
-                _, removed, promoted = self.playMove(x, y, nx, ny)
-                value = self.minimax(1 - player, player, maxDepth=maxDepth, evaluate=evaluate)
-                value += 2*self.stateValue(player)  
-                self.undoMove(x, y, nx, ny, removed, promoted)
-                if value > bestValue:
-                    bestValue = value
-                    bestMove = (x, y, nx, ny)
-
-        x, y, nx, ny = bestMove
-        if enablePrint:
-            print(f"Move from ({x}, {y}) to ({nx}, {ny})")
-        canCapture, removed, _ = self.playMove(x, y, nx, ny)
+        if self.stats is not None:
+            self.stats.start()
+        try:
+            if bookMove is not None:
+                bestMove = bookMove
+            elif timeLimit is not None:
+                if len(moves) == 1:
+                    # a forced move needs no search
+                    bestMove = moves[0]
+                else:
+                    _, bestMove, _ = self.iterativeDeepening(player, moves, timeLimit, evaluate, workers=workers,
+                        algorithm=algorithm)
+            else:
+                # the search of the previous turn has usually searched this position too
+                _, bestMove = self.searchRoot(player, moves, maxDepth, evaluate, self.expectedMove(player, player),
+                    workers=workers, algorithm=algorithm)
+        finally:
+            # like iterativeDeepening, a stop only ends the search it interrupted
+            self.stopped = False
+            if self.stats is not None:
+                self.stats.stop()
+
+        steps = self.playPath(bestMove)
+        for (x, y), (nx, ny) in zip(bestMove, bestMove[1:]):
+            self.lastMove.append((x, y, nx, ny))
+            if enablePrint:
+                print(f"Move from ({x}, {y}) to ({nx}, {ny})")
         if enablePrint:
-            self.printBoard(nx, ny)
-
-        if canCapture:
-            _, captures = self.nextPoss(nx, ny)
-            if len(captures) != 0:
-                self.minimaxPlay(player, [((nx, ny), captures)], maxDepth, evaluate, enablePrint)
+            self.printBoard(*bestMove[-1])
 
-        self.stateCounter[self.encodeBoard()] += 1
-        reset = removed != 0
+        self.remember(1 - player, self.irreversible(bestMove, steps))
+        reset = any(removed != 0 for removed, _ in steps)
         return True, reset
@@ -0,0 +1,147 @@
+"""Streaming batch analysis of positions and games.
+
+Reads FEN positions (one per line) or PDN games from a file or stdin,
+searches every position on a process pool and writes one JSON line per
+position as soon as it is done (not in input order, see "id"):
+
+    python analyse.py --fen positions.txt --time 0.5 --workers 8 > analysis.jsonl
+    python analyse.py --pdn archive.pdn --depth 6 --workers 8 > analysis.jsonl
+
+Input is read lazily and at most 2 * workers positions are in flight, so
+memory does not grow with the size of the input.
+"""
+import argparse
+import json
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from Algo import Checkers
+from bitboard import BitCheckers
+from pdn import fromFEN, moveText, parseGames, toFEN
+from tablebase import Tablebase
+
+BACKENDS = {"list": Checkers, "bitboard": BitCheckers}
+EVALUATIONS = {"evaluate2": Checkers.evaluate2, "endGame": Checkers.endGame}
+
+# position to analyse: (id, FEN, extra fields of the output line)
+Task = Tuple[str, str, Dict]
+
+
+def fenTasks(lines: Iterable[str]) -> Iterator[Task]:
+    """Tasks of a file of FEN positions, blank lines and # comments are skipped"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield str(number), line, {}
+
+
+def pdnTasks(lines: Iterable[str], size: int = 8) -> Iterator[Task]:
+    """Tasks of every position of every game of a PDN file, with the move played from it"""
+    for index, game in enumerate(parseGames(lines)):
+        ply = 0
+        try:
+            for position, player, path in game.positions(size=size):
+                extra = {"game": index, "ply": ply, "played": None if path is None else moveText(size, path)}
+                yield f"{index}:{ply}", toFEN(position, player), extra
+                ply += 1
+        except ValueError as e:
+            print(f"game {index}, ply {ply}: {e}", file=sys.stderr)
+
+
+_tablebases: Dict[str, Tablebase] = {}
+
+
+def analysePosition(fen: str, size: int, backend: str, evaluate: str, maxDepth: int,
+    timeLimit: Optional[float], quiescence: bool, tablebase: Optional[str]) -> Dict:
+    """Worker task: search one position
+
+    :return: dict: the best move, its score for the side to move, the depth reached
+        and the nodes searched; no move when the side to move has lost
+    """
+    game, player = fromFEN(fen, BACKENDS[backend], size)
+    game.enableQuiescence(quiescence)
+    if tablebase is not None:
+        if tablebase not in _tablebases:
+            _tablebases[tablebase] = Tablebase(tablebase)
+        game.useTablebase(_tablebases[tablebase])
+    paths = game.nextPaths(player)
+    if len(paths) == 0:
+        return {"move": None, "score": None, "depth": 0, "nodes": 0}
+    function = EVALUATIONS[evaluate]
+    game.tt.newSearch(game.searchContext(function))
+    if timeLimit is not None:
+        score, path, depth = game.iterativeDeepening(player, paths, timeLimit, function, maxDepth)
+    else:
+        score, path = game.searchRoot(player, paths, maxDepth, function)
+        depth = maxDepth
+    return {"move": moveText(size, path), "score": score, "depth": depth, "nodes": game.nodes + game.qnodes}
+
+
+def run(tasks: Iterable[Task], workers: int = 1, size: int = 8, backend: str = "list",
+    evaluate: str = "evaluate2", maxDepth: int = 6, timeLimit: Optional[float] = None,
+    quiescence: bool = True, tablebase: Optional[str] = None, out=sys.stdout) -> int:
+    """Analyse positions and write one JSON line per position as they finish
+
+    :return: int: number of positions analysed
+    """
+    count = 0
+    tasks = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        exhausted = False
+        while not exhausted or pending:
+            while not exhausted and len(pending) < 2 * workers:
+                task = next(tasks, None)
+                if task is None:
+                    exhausted = True
+                    break
+                future = executor.submit(analysePosition, task[1], size, backend, evaluate, maxDepth, timeLimit,
+                    quiescence, tablebase)
+                pending[future] = task
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, fen, extra = pending.pop(future)
+                record = {"id": key, "fen": fen}
+                record.update(extra)
+                try:
+                    record.update(future.result())
+                except ValueError as e:
+                    record["error"] = str(e)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse FEN positions or PDN games")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--fen", help="file of FEN positions, one per line (- for stdin)")
+    source.add_argument("--pdn", help="PDN file of games (- for stdin)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--size", type=int, default=8)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="list")
+    parser.add_argument("--eval", choices=sorted(EVALUATIONS), default="evaluate2")
+    parser.add_argument("--depth", type=int, default=6, help="search depth (max depth with --time)")
+    parser.add_argument("--time", type=float, default=None, help="seconds per position (iterative deepening)")
+    parser.add_argument("--no-quiescence", action="store_true")
+    parser.add_argument("--tablebase", default=None, help="endgame tablebase file")
+    args = parser.parse_args(argv)
+
+    path = args.fen or args.pdn
+    f = sys.stdin if path == "-" else open(path)
+    try:
+        tasks = fenTasks(f) if args.fen else pdnTasks(f, args.size)
+        count = run(tasks, args.workers, args.size, args.backend, args.eval, args.depth, args.time,
+            not args.no_quiescence, args.tablebase)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    print(f"{count} positions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
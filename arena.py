@@ -0,0 +1,222 @@
+"""Headless engine-vs-engine arena.
+
+Plays games between two engine configurations on a process pool and
+streams one JSON line per finished game, e.g.
+
+    python arena.py --games 1000 --workers 16 --a-eval evaluate2 --a-depth 5 --b-time 0.2
+"""
+import argparse
+import json
+import random
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Optional
+
+from Algo import Checkers
+from bitboard import BitCheckers
+from book import OpeningBook
+from mcts import DEFAULT_ITERATIONS, MCTS
+from ordering import MoveOrdering
+from tablebase import Tablebase
+from transposition import TranspositionTable
+
+BACKENDS = {"list": Checkers, "bitboard": BitCheckers}
+EVALUATIONS = {"evaluate2": Checkers.evaluate2, "endGame": Checkers.endGame}
+# minimax searches (Checkers.ALGORITHMS) and Monte Carlo tree search
+ALGORITHMS = Checkers.ALGORITHMS + ("mcts",)
+
+# same limits as checkers.py
+DRAW_MOVES = 100
+END_GAME_MOVES = 20
+
+
+class Engine(object):
+    """
+    Search settings of one side.
+
+    evaluate is "evaluate2", "endGame" or "auto"; auto switches from evaluate2
+    to endGame after END_GAME_MOVES moves without capture, like checkers.py.
+    quiescence resolves captures at the horizon (see Checkers.quiesce).
+    algorithm is one of ALGORITHMS; mcts (see mcts.py) ignores the evaluation,
+    depth and quiescence and runs iterations playouts, or timeLimit seconds.
+    """
+
+    def __init__(self, evaluate: str = "auto", maxDepth: int = 4, timeLimit: Optional[float] = None,
+        quiescence: bool = False, algorithm: str = "minimax", iterations: int = DEFAULT_ITERATIONS):
+        if evaluate != "auto" and evaluate not in EVALUATIONS:
+            raise ValueError(f"unknown evaluation function: {evaluate}")
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"unknown search algorithm: {algorithm}")
+        self.evaluate = evaluate
+        self.maxDepth = maxDepth
+        self.timeLimit = timeLimit
+        self.quiescence = quiescence
+        self.algorithm = algorithm
+        self.iterations = iterations
+
+    def evaluation(self, cnt: int):
+        """Get the evaluation function to use after cnt moves without capture"""
+        if self.evaluate == "auto":
+            return Checkers.endGame if cnt > END_GAME_MOVES else Checkers.evaluate2
+        return EVALUATIONS[self.evaluate]
+
+    def toDict(self) -> Dict:
+        return {"evaluate": self.evaluate, "maxDepth": self.maxDepth, "timeLimit": self.timeLimit,
+            "quiescence": self.quiescence, "algorithm": self.algorithm, "iterations": self.iterations}
+
+
+def playGame(white: Engine, black: Engine, size: int = 8, seed: int = None, backend: str = "list",
+    tablebase: Optional[str] = None, book: Optional[str] = None) -> Dict:
+    """Play one engine-vs-engine game, black moves first
+
+    The game is drawn after DRAW_MOVES moves without capture, repeated positions
+    are penalised by minimaxPlay through the game's stateCounter. Each side
+    searches with its own transposition table and move ordering, so neither
+    its settings nor its node counts depend on the other side's searches.
+
+    :param:
+        white, black: the engines of each side
+        size: size of the checkers board
+        seed: seed of the random choice between equal moves
+        backend: board representation, a key of BACKENDS
+        tablebase: path of an endgame tablebase both sides use
+        book: path of an opening book both sides use
+    :return: dict: moves (the steps of every turn), result ("white", "black"
+        or "draw"), plies, and nodes searched by each side
+    """
+    random.seed(seed)
+    game = BACKENDS[backend](size)
+    if tablebase is not None:
+        game.useTablebase(_tablebase(tablebase))
+    if book is not None:
+        game.useBook(_book(book))
+    engines = {Checkers.WHITE: white, Checkers.BLACK: black}
+    # one tree per Monte Carlo side, kept between its moves
+    searchers = {player: MCTS(game, seed=None if seed is None else 2 * seed + player)
+        for player, engine in engines.items() if engine.algorithm == "mcts"}
+    # search state of each minimax side, swapped into the game before its searches
+    tables = {player: TranspositionTable(Checkers.TT_BITS, Checkers.TT_MAX_AGE) for player in engines}
+    orderings = {player: MoveOrdering(size) for player in engines}
+    nodes = {Checkers.WHITE: 0, Checkers.BLACK: 0}
+    moves = []
+    player = Checkers.BLACK
+    cnt = 0
+    result = "draw"
+    while cnt < DRAW_MOVES:
+        engine = engines[player]
+        game.nodes = 0
+        if player in searchers:
+            searcher = searchers[player]
+            if engine.timeLimit is not None:
+                cont, reset = searcher.play(player, timeLimit=engine.timeLimit)
+            else:
+                cont, reset = searcher.play(player, engine.iterations)
+            # playouts stand for nodes
+            game.nodes = searcher.playouts
+        else:
+            game.tt = tables[player]
+            game.ordering = orderings[player]
+            game.enableQuiescence(engine.quiescence)
+            cont, reset = game.minimaxPlay(player, maxDepth=engine.maxDepth, evaluate=engine.evaluation(cnt),
+                enablePrint=False, timeLimit=engine.timeLimit, algorithm=engine.algorithm)
+        nodes[player] += game.nodes
+        if not cont:
+            result = "white" if player == Checkers.BLACK else "black"
+            break
+        moves.append([list(step) for step in game.lastMove])
+        cnt = 0 if reset else cnt + 1
+        player = 1 - player
+
+    return {
+        "seed": seed,
+        "result": result,
+        "plies": len(moves),
+        "nodes": {"white": nodes[Checkers.WHITE], "black": nodes[Checkers.BLACK]},
+        "moves": moves,
+    }
+
+
+_tablebases: Dict[str, Tablebase] = {}
+_books: Dict[str, OpeningBook] = {}
+
+
+def _tablebase(path: str) -> Tablebase:
+    """Open a tablebase once per process"""
+    if path not in _tablebases:
+        _tablebases[path] = Tablebase(path)
+    return _tablebases[path]
+
+
+def _book(path: str) -> OpeningBook:
+    """Open an opening book once per process"""
+    if path not in _books:
+        _books[path] = OpeningBook(path)
+    return _books[path]
+
+
+def _playPairing(index: int, a: Engine, b: Engine, size: int, seed: int, backend: str,
+    tablebase: Optional[str], book: Optional[str]) -> Dict:
+    """Worker task: play game `index`, engine A takes white on even games"""
+    white, black = (a, b) if index % 2 == 0 else (b, a)
+    record = playGame(white, black, size, seed + index, backend, tablebase, book)
+    sides = {"white": "A", "black": "B"} if index % 2 == 0 else {"white": "B", "black": "A"}
+    record["game"] = index
+    record["white"] = sides["white"]
+    record["winner"] = sides.get(record["result"])
+    return record
+
+
+def run(a: Engine, b: Engine, games: int, workers: int = 1, size: int = 8, seed: int = 0,
+    backend: str = "list", tablebase: Optional[str] = None, book: Optional[str] = None, out=sys.stdout):
+    """Play games between engines A and B and write one JSON line per game as they finish
+
+    At most 2 * workers games are queued at a time, so memory does not grow with
+    the number of games.
+
+    :return: dict: wins of A, wins of B and draws
+    """
+    score = {"A": 0, "B": 0, "draw": 0}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        index = 0
+        while index < games or pending:
+            while index < games and len(pending) < 2 * workers:
+                pending.add(executor.submit(_playPairing, index, a, b, size, seed, backend, tablebase, book))
+                index += 1
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                score[record["winner"] or "draw"] += 1
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+    return score
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine checkers games")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--size", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="list")
+    parser.add_argument("--tablebase", default=None, help="endgame tablebase file used by both sides")
+    parser.add_argument("--book", default=None, help="opening book file used by both sides")
+    for side in ("a", "b"):
+        parser.add_argument(f"--{side}-eval", choices=["auto"] + sorted(EVALUATIONS), default="auto")
+        parser.add_argument(f"--{side}-depth", type=int, default=4)
+        parser.add_argument(f"--{side}-time", type=float, default=None,
+            help="seconds per move (iterative deepening), overrides the depth")
+        parser.add_argument(f"--{side}-quiescence", action="store_true", help="resolve captures at the horizon")
+        parser.add_argument(f"--{side}-algorithm", choices=ALGORITHMS, default="minimax")
+        parser.add_argument(f"--{side}-iterations", type=int, default=DEFAULT_ITERATIONS,
+            help="playouts per move of mcts (unless a time is given)")
+    args = parser.parse_args(argv)
+
+    a = Engine(args.a_eval, args.a_depth, args.a_time, args.a_quiescence, args.a_algorithm, args.a_iterations)
+    b = Engine(args.b_eval, args.b_depth, args.b_time, args.b_quiescence, args.b_algorithm, args.b_iterations)
+    score = run(a, b, args.games, args.workers, args.size, args.seed, args.backend, args.tablebase, args.book)
+    print(json.dumps({"A": a.toDict(), "B": b.toDict(), "score": score}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Vectorised evaluation of many boards at once.
+
+Boards are stacked into an (N, size, size) int8 array and every term of
+Checkers.evaluate2 / Checkers.endGame is computed with array operations,
+giving the same scores as the per-board functions.
+
+This is a tool for analysis and tuning jobs (tune.py) that score many
+stored positions at once, the search does not use it: the NumPy call
+overhead is larger than the per-board evaluation of a sibling group, and
+frontierScores takes 2-4 times as long as scoring the children one by one.
+"""
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+
+from Algo import Board, Checkers, Path
+
+OFF_BOARD = -1
+
+
+def stackBoards(boards: Sequence[Board]) -> np.ndarray:
+    """Stack boards into an (N, size, size) int8 array"""
+    return np.asarray(boards, dtype=np.int8)
+
+
+def _pieces(boards: np.ndarray, maximizer: int):
+    """Masks of the maximizer's and the minimizer's pieces"""
+    occupied = boards != 0
+    maxPieces = occupied & (boards % 2 == maximizer)
+    return maxPieces, occupied & ~maxPieces
+
+
+def evaluate2Features(boards: np.ndarray, maximizer: int) -> np.ndarray:
+    """Count the features of Checkers.evaluate2 on every board
+
+    :param: boards: (N, size, size) array of boards ; maximizer: WHITE or BLACK
+    :return: np.ndarray: (N, len(weights.FEATURES)) counts (int64), evaluate2 is
+        their dot product with Checkers.EVAL_WEIGHTS
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    _, size, _ = boards.shape
+    own, other = _pieces(boards, maximizer)
+    sign = own.astype(np.int64) - other.astype(np.int64)
+    isMan = (boards > 0) & (boards <= 2)
+    isKing = boards > 2
+
+    men = (sign * isMan).sum(axis=(1, 2))
+    kings = (sign * isKing).sum(axis=(1, 2))
+
+    backRow = own[:, 0 if maximizer == Checkers.WHITE else size - 1, :].sum(axis=1)
+
+    rows = np.arange(size)
+    middle = (rows == size/2-1) | (rows == size/2)
+    box = (rows >= size/2-2) & (rows < size/2+2)
+    middleBox = (sign * (middle[:, None] & box[None, :])).sum(axis=(1, 2))
+    middleRow = (sign * (middle[:, None] & ~box[None, :])).sum(axis=(1, 2))
+
+    # vulnerable: an opponent (of the maximizer) on a diagonal neighbour, the
+    # opposite neighbour empty, and the neighbour a king or moving the other way
+    padded = np.pad(boards, ((0, 0), (1, 1), (1, 1)), constant_values=OFF_BOARD)
+    myDir = 1 if maximizer == Checkers.WHITE else -1
+    vul = np.zeros(boards.shape, dtype=bool)
+    for dx, dy in zip(Checkers.DX, Checkers.DY):
+        near = padded[:, 1+dx:1+dx+size, 1+dy:1+dy+size]
+        far = padded[:, 1-dx:1-dx+size, 1-dy:1-dy+size]
+        attacker = (near > 0) & (near % 2 != maximizer) & (far == 0)
+        if myDir == dx:
+            attacker &= near > 2
+        vul |= attacker
+    vulnerable = (sign * vul).sum(axis=(1, 2))
+    protected = (sign * ~vul).sum(axis=(1, 2))
+
+    return np.stack([men, kings, backRow, middleBox, middleRow, vulnerable, protected], axis=1).astype(np.int64)
+
+
+def evaluate2Batch(boards: np.ndarray, maximizer: int, weights: Sequence[int] = Checkers.EVAL_WEIGHTS) -> np.ndarray:
+    """Score every board like Checkers.evaluate2
+
+    :param: boards: (N, size, size) array of boards ; maximizer: WHITE or BLACK
+        weights: the evaluate2 weights. Defaults to those of Checkers
+    :return: np.ndarray: the N scores (int64)
+    """
+    return evaluate2Features(boards, maximizer) @ np.asarray(weights, dtype=np.int64)
+
+
+def endGameBatch(boards: np.ndarray, maximizer: int) -> np.ndarray:
+    """Score every board like Checkers.endGame
+
+    The sum of squared distances between every maximizer and minimizer piece
+    is expanded into per-board sums, so it costs O(size * size) per board.
+
+    :param: boards: (N, size, size) array of boards ; maximizer: WHITE or BLACK
+    :return: np.ndarray: the N scores (int64)
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    _, size, _ = boards.shape
+    own, other = _pieces(boards, maximizer)
+    own64 = own.astype(np.int64)
+    other64 = other.astype(np.int64)
+    weight = (boards.astype(np.int64) + 1) // 2
+
+    maxPieces = own64.sum(axis=(1, 2))
+    minPieces = other64.sum(axis=(1, 2))
+    score1 = (weight * own64).sum(axis=(1, 2)) - (weight * other64).sum(axis=(1, 2))
+
+    base = 0 if maximizer == Checkers.WHITE else size-1
+    rows = np.arange(size, dtype=np.int64)
+    rowScore = ((own & (weight == 1)) * np.abs(base - rows)[:, None]).sum(axis=(1, 2))
+
+    # sum over pairs (a, b) of (xa-xb)^2 + (ya-yb)^2
+    x = rows[:, None]
+    y = rows[None, :]
+    sq = x * x + y * y
+    score2 = minPieces * (own64 * sq).sum(axis=(1, 2)) + maxPieces * (other64 * sq).sum(axis=(1, 2)) \
+        - 2 * ((own64 * x).sum(axis=(1, 2)) * (other64 * x).sum(axis=(1, 2))
+            + (own64 * y).sum(axis=(1, 2)) * (other64 * y).sum(axis=(1, 2)))
+
+    corners = np.zeros((size, size), dtype=bool)
+    for cx, cy in ((0, 1), (1, 0), (size-1, size-2), (size-2, size-1)):
+        corners[cx, cy] = True
+    minimizerCorner = (other & corners).any(axis=(1, 2)).astype(np.int64)
+    maximizerCorner = (own & corners).any(axis=(1, 2)).astype(np.int64)
+
+    return np.where(maxPieces > minPieces,
+        score1*1000 - score2 - minimizerCorner*5 + rowScore*10,
+        score1*1000 + score2 + maximizerCorner*5)
+
+
+BATCH_EVALUATIONS = {Checkers.evaluate2: evaluate2Batch, Checkers.fullEvaluate2: evaluate2Batch,
+    Checkers.endGame: endGameBatch, Checkers.fullEndGame: endGameBatch}
+
+
+def evaluateBatch(boards: np.ndarray, maximizer: int, evaluate: Callable[[int], int] = Checkers.evaluate2) -> np.ndarray:
+    """Score boards with the batched version of an evaluation function
+
+    :param: boards: (N, size, size) array ; maximizer: WHITE or BLACK
+            evaluate: Checkers.evaluate2 or Checkers.endGame
+    :return: np.ndarray: the N scores
+    """
+    return BATCH_EVALUATIONS[evaluate](boards, maximizer)
+
+
+def frontierScores(game: Checkers, player: int, maximizer: int,
+    evaluate: Callable[[int], int] = Checkers.evaluate2) -> List[Tuple[Path, int]]:
+    """Score every position one move away from the current one in a single batch,
+    for analysis (slower than the per-board evaluation, see the module documentation)
+
+    :param:
+        game: the game, left unchanged
+        player: the type of the player to move (WHITE, BLACK)
+        maximizer: the type of the maximizer player (WHITE, BLACK)
+        evaluate: Checkers.evaluate2 or Checkers.endGame
+    :return: list of (path, score), see Checkers.nextPaths
+    """
+    moves = game.nextPaths(player)
+    boards = []
+    for path in moves:
+        steps = game.playPath(path)
+        boards.append([list(row) for row in game.board])
+        game.undoPath(path, steps)
+    if not moves:
+        return []
+    scores = evaluateBatch(stackBoards(boards), maximizer, evaluate)
+    return list(zip(moves, scores.tolist()))
@@ -0,0 +1,224 @@
+"""Reproducible benchmark of the move generator, the search and the evaluations.
+
+Runs on a fixed set of positions and writes one JSON document, so runs on
+different commits can be compared:
+
+    python bench.py --out before.json
+    python bench.py --out after.json --compare before.json
+
+For each position: perft nodes per second, a fixed-depth search (time and
+nodes, from cleared tables and without random move shuffling), and
+evaluate2/endGame calls per second.
+
+    python bench.py --check-pvs
+
+searches the positions with minimax and with pvs instead (with and without
+quiescence), reports any score or move that differs and the share of nodes
+pvs visits, and exits with status 1 on a mismatch.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from Algo import Board, Checkers
+from bitboard import BitCheckers
+
+BACKENDS = {"list": Checkers, "bitboard": BitCheckers}
+
+# rows of an 8x8 board, top (row 0) to bottom: w/W white man/king, b/B black man/king
+PIECES = {".": 0, "w": Checkers.WHITE_MAN, "W": Checkers.WHITE_KING, "b": Checkers.BLACK_MAN, "B": Checkers.BLACK_KING}
+
+# name -> (board rows, side to move), None rows: the initial position
+POSITIONS: Dict[str, Tuple[Optional[List[str]], int]] = {
+    "opening": (None, Checkers.BLACK),
+    "middlegame": ([
+        ".w.w.w.w",
+        "w.w...w.",
+        "...w.w.w",
+        "..w.....",
+        ".b...b..",
+        "b...b.b.",
+        ".b.b...b",
+        "b.b.b.b.",
+    ], Checkers.BLACK),
+    "endgame": ([
+        "........",
+        "....W...",
+        "........",
+        "....w...",
+        ".B......",
+        "........",
+        ".....b..",
+        "..B.....",
+    ], Checkers.WHITE),
+}
+
+# perft of the initial 8x8 position with black to move, by depth (published English draughts values)
+PERFT_INITIAL = [1, 7, 49, 302, 1469, 7361, 36768, 179740, 845931]
+
+
+def parseBoard(rows: List[str]) -> Board:
+    board = [[PIECES[c] for c in row] for row in rows]
+    for x, row in enumerate(board):
+        for y, piece in enumerate(row):
+            if piece != 0 and (x + y) % 2 == 0:
+                raise ValueError(f"piece on a light square: ({x}, {y})")
+    return board
+
+
+def _timed(function, repeat: int):
+    """Best wall-clock time of repeat calls, and the result of the last one"""
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchPosition(cls, rows: Optional[List[str]], player: int, perftDepth: int, searchDepth: int,
+    evalCalls: int, repeat: int) -> Dict:
+    """Benchmark one position on one backend"""
+    game = cls(8)
+    if rows is not None:
+        game.setBoard(parseBoard(rows))
+
+    seconds, nodes = _timed(lambda: game.perft(player, perftDepth), repeat)
+    perft = {"depth": perftDepth, "nodes": nodes, "seconds": seconds, "nodesPerSecond": nodes / seconds}
+    if rows is None and player == Checkers.BLACK and perftDepth < len(PERFT_INITIAL):
+        perft["correct"] = nodes == PERFT_INITIAL[perftDepth]
+
+    def search():
+        game.tt.clear()
+        game.ordering.clear()
+        game.nodes = 0
+        return game.searchRoot(player, game.nextPaths(player), searchDepth, Checkers.evaluate2)
+    seconds, (value, move) = _timed(search, repeat)
+    searchResult = {"depth": searchDepth, "nodes": game.nodes, "seconds": seconds,
+        "nodesPerSecond": game.nodes / seconds, "value": value, "move": list(move) if move else None}
+
+    evals = {}
+    for name in ("evaluate2", "endGame"):
+        evaluate = getattr(game, name)
+
+        def calls():
+            for _ in range(evalCalls):
+                evaluate(player)
+        seconds, _ = _timed(calls, repeat)
+        evals[name] = evalCalls / seconds
+
+    return {"perft": perft, "search": searchResult, "evalsPerSecond": evals}
+
+
+def _search(game, player: int, depth: int, algorithm: str):
+    """Fixed-depth root search from cleared tables: (score, move, nodes)"""
+    game.tt.clear()
+    game.ordering.clear()
+    game.nodes = game.qnodes = 0
+    value, move = game.searchRoot(player, game.nextPaths(player), depth, Checkers.evaluate2, algorithm=algorithm)
+    return value, move, game.nodes + game.qnodes
+
+
+def checkPVS(backends: List[str], searchDepth: int) -> Dict:
+    """Search every position with minimax and pvs, they must agree on the score and the move
+
+    :return: dict: per backend, position and quiescence setting the results of both searches,
+        the pvs/minimax node ratio, and the mismatches
+    """
+    results = {}
+    mismatches = []
+    totals = {"minimax": 0, "pvs": 0}
+    for backend in backends:
+        for name, (rows, player) in POSITIONS.items():
+            for quiescence in (False, True):
+                game = BACKENDS[backend](8)
+                if rows is not None:
+                    game.setBoard(parseBoard(rows))
+                game.enableQuiescence(quiescence)
+                found = {}
+                for algorithm in ("minimax", "pvs"):
+                    value, move, nodes = _search(game, player, searchDepth, algorithm)
+                    found[algorithm] = {"value": value, "move": list(move) if move else None, "nodes": nodes}
+                    totals[algorithm] += nodes
+                key = f"{backend}/{name}" + ("/quiescence" if quiescence else "")
+                minimax, pvs = found["minimax"], found["pvs"]
+                found["nodeRatio"] = pvs["nodes"] / max(minimax["nodes"], 1)
+                results[key] = found
+                if (minimax["value"], minimax["move"]) != (pvs["value"], pvs["move"]):
+                    mismatches.append(f"{key}: minimax {minimax['value']} {minimax['move']}, "
+                        f"pvs {pvs['value']} {pvs['move']}")
+    return {"depth": searchDepth, "results": results, "nodeRatio": totals["pvs"] / max(totals["minimax"], 1),
+        "mismatches": mismatches}
+
+
+def run(backends: List[str], perftDepth: int, searchDepth: int, evalCalls: int, repeat: int) -> Dict:
+    results = {}
+    for backend in backends:
+        for name, (rows, player) in POSITIONS.items():
+            results[f"{backend}/{name}"] = benchPosition(BACKENDS[backend], rows, player, perftDepth,
+                searchDepth, evalCalls, repeat)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"perftDepth": perftDepth, "searchDepth": searchDepth, "evalCalls": evalCalls,
+            "repeat": repeat},
+        "results": results,
+    }
+
+
+def compare(new: Dict, old: Dict) -> List[str]:
+    """Lines of new/old ratios of the speeds and node counts found in both runs"""
+    lines = []
+    for key, result in new["results"].items():
+        before = old["results"].get(key)
+        if before is None:
+            continue
+        ratios = [
+            ("perft nps", result["perft"]["nodesPerSecond"] / before["perft"]["nodesPerSecond"]),
+            ("search time", result["search"]["seconds"] / before["search"]["seconds"]),
+            ("search nodes", result["search"]["nodes"] / max(before["search"]["nodes"], 1)),
+        ] + [(f"{name}/s", speed / before["evalsPerSecond"][name]) for name, speed in result["evalsPerSecond"].items()]
+        lines.append(f"{key}: " + ", ".join(f"{label} x{ratio:.2f}" for label, ratio in ratios))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark move generation, search and evaluation")
+    parser.add_argument("--backend", choices=sorted(BACKENDS) + ["all"], default="all")
+    parser.add_argument("--perft-depth", type=int, default=5)
+    parser.add_argument("--search-depth", type=int, default=6)
+    parser.add_argument("--eval-calls", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measure, the best one is kept")
+    parser.add_argument("--out", default=None, help="JSON output file (default: stdout)")
+    parser.add_argument("--compare", default=None, help="JSON file of an earlier run to compare with")
+    parser.add_argument("--check-pvs", action="store_true",
+        help="check that pvs finds the scores and moves of minimax at the search depth, with fewer nodes")
+    args = parser.parse_args(argv)
+
+    backends = sorted(BACKENDS) if args.backend == "all" else [args.backend]
+    if args.check_pvs:
+        report = checkPVS(backends, args.search_depth)
+        print(json.dumps(report, indent=2))
+        for line in report["mismatches"]:
+            print(line, file=sys.stderr)
+        print(f"pvs/minimax nodes x{report['nodeRatio']:.2f}, {len(report['mismatches'])} mismatches", file=sys.stderr)
+        sys.exit(1 if report["mismatches"] else 0)
+    report = run(backends, args.perft_depth, args.search_depth, args.eval_calls, args.repeat)
+    text = json.dumps(report, indent=2)
+    if args.out is None:
+        print(text)
+    else:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    if args.compare is not None:
+        with open(args.compare) as f:
+            for line in compare(report, json.load(f)):
+                print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+from Algo import Board, Checkers, Moves
+from geometry import geometry
+
+
+class BitCheckers(Checkers):
+    """
+    Checkers on packed bitmasks.
+
+    Keeps one mask per colour and one for kings instead of a list of lists,
+    and exposes the same nextPoss/nextMoves/playMove/undoMove API, so
+    minimax, minimaxPlay and checkers.py run on it unchanged.
+    `board` is a read-only view rebuilt on demand.
+    """
+
+    def __init__(self, size: int = 8):
+        """Initial board.
+
+        :param: size: size of the checkers board. Defaluts to 8
+        :return: None
+        """
+        self.geo = geometry(size)
+        self._board = None
+        super().__init__(size)
+
+    @property
+    def board(self) -> Board:
+        if self._board is None:
+            board = [[0] * self.size for _ in range(self.size)]
+            for b, (x, y) in enumerate(self.geo.coords):
+                board[x][y] = self.pieceAt(b)
+            self._board = board
+        return self._board
+
+    @board.setter
+    def board(self, board: Board):
+        self.white = 0
+        self.black = 0
+        self.kings = 0
+        for b, (x, y) in enumerate(self.geo.coords):
+            piece = board[x][y]
+            if piece == 0:
+                continue
+            if piece % 2 == self.WHITE:
+                self.white |= 1 << b
+            else:
+                self.black |= 1 << b
+            if piece > 2:
+                self.kings |= 1 << b
+        self._board = None
+
+    def pack(self) -> bytes:
+        """Pack the game board into one byte per playable square
+
+        :return: bytes: the packed board
+        """
+        return bytes(self.pieceAt(b) for b in range(self.geo.count))
+
+    def unpack(self, data: bytes):
+        """Set game board from a board packed by pack()
+
+        :param: data: the packed board
+        """
+        self.white = self.black = self.kings = 0
+        for b, piece in enumerate(data):
+            if piece == 0:
+                continue
+            if piece % 2 == self.WHITE:
+                self.white |= 1 << b
+            else:
+                self.black |= 1 << b
+            if piece > 2:
+                self.kings |= 1 << b
+        self._board = None
+        self.boardChanged()
+
+    def fullEvaluate2(self, maximizer: int):
+        """evaluate2 computed on the masks, without building the board view
+
+        :param: maximizer (int): the type of the maximizer player (WHITE, BLACK)
+        :return: int: value of the board
+        """
+        geo = self.geo
+        own, opp = (self.white, self.black) if maximizer == self.WHITE else (self.black, self.white)
+        kings = self.kings
+        empty = geo.full & ~(own | opp)
+
+        # squares an opponent piece can capture on: the attacker next to the square and an
+        # empty square behind it, opponent men only attack in their own direction.
+        # geo.shift is inlined, every direction is two shifts of the same sign
+        myDir = 1 if maximizer == self.WHITE else -1
+        oppKings = opp & kings
+        vul = 0
+        for d, (dx, _) in enumerate(geo.DIRS):
+            attackers = opp if dx != myDir else oppKings
+            if attackers:
+                (s1, m1), (s2, m2) = geo.shifts[d]
+                (r1, n1), (r2, n2) = geo.shifts[geo.REVERSE[d]]
+                if s1 > 0:
+                    vul |= (((attackers & n1) >> -r1) | ((attackers & n2) >> -r2)) \
+                        & (((empty & m1) << s1) | ((empty & m2) << s2))
+                else:
+                    vul |= (((attackers & n1) << r1) | ((attackers & n2) << r2)) \
+                        & (((empty & m1) >> -s1) | ((empty & m2) >> -s2))
+
+        def count(mask):
+            return bin(own & mask).count("1") - bin(opp & mask).count("1")
+
+        men = count(~kings)
+        kingCount = count(kings)
+        backRow = bin(own & geo.backRow[maximizer]).count("1")
+        middleBox = count(geo.middleBox)
+        middleRow = count(geo.middleRow)
+        vulnerable = count(vul)
+        protected = men + kingCount - vulnerable
+
+        wMen, wKings, wBackRow, wMiddleBox, wMiddleRow, wVulnerable, wProtected = self.EVAL_WEIGHTS
+        return men*wMen + kingCount*wKings + backRow*wBackRow + middleBox*wMiddleBox + middleRow*wMiddleRow \
+            + vulnerable*wVulnerable + protected*wProtected
+
+    def fullEndGame(self, maximizer: int) -> int:
+        """endGame computed on the masks, without building the board view
+
+        :param: maximizer (int): the type of the maximizer player (WHITE, BLACK)
+        :return: score of the board
+        """
+        geo = self.geo
+        own, opp = (self.white, self.black) if maximizer == self.WHITE else (self.black, self.white)
+        kings = self.kings
+        ownCount = bin(own).count("1")
+        oppCount = bin(opp).count("1")
+        # men count 1 and kings 2
+        score1 = ownCount + bin(own & kings).count("1") - oppCount - bin(opp & kings).count("1")
+
+        base = 0 if maximizer == self.WHITE else self.size-1
+        rowScore = 0
+        score2 = 0
+        oppSquares = []
+        rest = opp
+        while rest:
+            low = rest & -rest
+            rest ^= low
+            oppSquares.append(low.bit_length() - 1)
+        rest = own
+        while rest:
+            low = rest & -rest
+            rest ^= low
+            b = low.bit_length() - 1
+            if not kings & low:
+                rowScore += abs(base - geo.coords[b][0])
+            distance = geo.distance[b]
+            for m in oppSquares:
+                score2 += distance[m]
+
+        # penalize if the minimizer is in the corner to be able to trap him at the end of the game
+        minimizerCorner = 1 if opp & geo.corners else 0
+        maximizerCorner = 1 if own & geo.corners else 0
+
+        if ownCount > oppCount:   #come closer to opponent
+            return score1*1000 - score2 - minimizerCorner*5 + rowScore*10
+        else:    # run away
+            return score1*1000 + score2 + maximizerCorner*5
+
+    def material(self):
+        """Count the pieces on the masks
+
+        :return: (int, int, int, int): white men, white kings, black men, black kings
+        """
+        kings = self.kings
+        return (bin(self.white & ~kings).count("1"), bin(self.white & kings).count("1"),
+            bin(self.black & ~kings).count("1"), bin(self.black & kings).count("1"))
+
+    def pieceAt(self, b: int) -> int:
+        """Get the piece on square b
+
+        :param: b: square index
+        :return: int: the piece (0 if the square is empty)
+        """
+        bit = 1 << b
+        if self.white & bit:
+            return self.WHITE_KING if self.kings & bit else self.WHITE_MAN
+        if self.black & bit:
+            return self.BLACK_KING if self.kings & bit else self.BLACK_MAN
+        return 0
+
+    def _squarePoss(self, b: int, player: int, king: bool, opp: int, empty: int):
+        """Get the next normal and capture squares of the piece on square b"""
+        geo = self.geo
+        step = geo.step[b]
+        jump = geo.jump[b]
+        order = geo.ORDER[player] if king else geo.ORDER[player][:2]
+        normal = []
+        capture = []
+        for d in order:
+            n = step[d]
+            if n < 0:
+                continue
+            if empty >> n & 1:
+                normal.append(geo.coords[n])
+            elif opp >> n & 1:
+                j = jump[d]
+                if j >= 0 and empty >> j & 1:
+                    capture.append(geo.coords[j])
+        return normal, capture
+
+    def nextPoss(self, x: int, y: int):
+        """Get the possible next positions for a given position
+
+        :param:x : x position
+               y : y position
+        :return:(Positions, Positions): next normal positions, next capture positions
+        """
+        b = self.geo.index[x][y]
+        if b < 0 or not (self.white | self.black) >> b & 1:
+            return []
+        bit = 1 << b
+        player = self.WHITE if self.white & bit else self.BLACK
+        opp = self.black if player == self.WHITE else self.white
+        empty = self.geo.full & ~(self.white | self.black)
+        return self._squarePoss(b, player, bool(self.kings & bit), opp, empty)
+
+    def nextMoves(self, player: int):
+        """Get the next moves of the game board for a certian player
+
+        :param:player (int): the type of player (WHITE, BLACK)
+        :return:Moves: valid moves for the player
+        """
+        geo = self.geo
+        own, opp = (self.white, self.black) if player == self.WHITE else (self.black, self.white)
+        ownKings = own & self.kings
+        empty = geo.full & ~(self.white | self.black)
+        order = geo.ORDER[player]
+
+        # find the pieces that can capture / move with shifts over whole sets,
+        # geo.shift is inlined: every direction is two shifts of the same sign
+        capturers = 0
+        movers = 0
+        for i, d in enumerate(order):
+            pieces = own if i < 2 else ownKings
+            if not pieces:
+                continue
+            (s1, m1), (s2, m2) = geo.shifts[geo.REVERSE[d]]
+            if s1 > 0:
+                behindEmpty = ((empty & m1) << s1) | ((empty & m2) << s2)
+                jumpable = opp & behindEmpty
+                capturers |= pieces & (((jumpable & m1) << s1) | ((jumpable & m2) << s2))
+            else:
+                behindEmpty = ((empty & m1) >> -s1) | ((empty & m2) >> -s2)
+                jumpable = opp & behindEmpty
+                capturers |= pieces & (((jumpable & m1) >> -s1) | ((jumpable & m2) >> -s2))
+            movers |= pieces & behindEmpty
+
+        sources = capturers if capturers else movers
+        moves: Moves = []
+        while sources:
+            low = sources & -sources
+            sources ^= low
+            b = low.bit_length() - 1
+            normal, capture = self._squarePoss(b, player, bool(ownKings & low), opp, empty)
+            poss = capture if capturers else normal
+            if len(poss) != 0:
+                moves.append((geo.coords[b], poss))
+        return moves
+
+    def playMove(self, x: int, y: int, nx: int, ny: int):
+        """Change the board by playing a move from (x, y) to (nx, ny)
+
+        :param:x : old x ;y : old y ;nx : new x ;ny :new y
+        :return: canCapture (bool): if the player can capture more pieces.
+                 removed (int): the removed piece.
+                 whetherking (bool) if the current piece is king.
+        """
+        geo = self.geo
+        s = geo.index[x][y]
+        d = geo.index[nx][ny]
+        src = 1 << s
+        dst = 1 << d
+        self._board = None
+        piece = self.pieceAt(s)
+        self.hash ^= geo.zobrist[s][piece] ^ geo.zobrist[d][piece]
+        white = self.white & src != 0
+        if white:
+            self.white ^= src | dst
+        else:
+            self.black ^= src | dst
+        if self.kings & src:
+            self.kings ^= src | dst
+
+        removed = 0
+        promoted = False
+        if abs(nx - x) == 2:  # capture move
+            m = geo.index[(x + nx) // 2][(y + ny) // 2]
+            mid = 1 << m
+            removed = self.pieceAt(m)
+            self.hash ^= geo.zobrist[m][removed]
+            # remove captured piece
+            self.white &= ~mid
+            self.black &= ~mid
+            self.kings &= ~mid
+            self.pieces -= 1
+
+        # become king, unless a king was removed
+        if removed <= 2 and not self.kings & dst:
+            promotion = geo.whitePromotion if white else geo.blackPromotion
+            if promotion & dst:
+                self.kings |= dst
+                self.hash ^= geo.zobrist[d][piece] ^ geo.zobrist[d][piece + 2]
+                promoted = True
+
+        return 0 < removed <= 2 and not promoted, removed, promoted
+
+    def undoMove(self, x: int, y: int, nx: int, ny: int, removed=0, promoted=False):
+        """Undo a move and return the board to its previous state
+
+        """
+        geo = self.geo
+        s = geo.index[x][y]
+        d = geo.index[nx][ny]
+        src = 1 << s
+        dst = 1 << d
+        self._board = None
+        if promoted:
+            self.hash ^= geo.zobrist[d][self.pieceAt(d)]
+            self.kings &= ~dst
+            self.hash ^= geo.zobrist[d][self.pieceAt(d)]
+        piece = self.pieceAt(d)
+        self.hash ^= geo.zobrist[s][piece] ^ geo.zobrist[d][piece]
+
+        if self.white & dst:
+            self.white ^= src | dst
+        else:
+            self.black ^= src | dst
+        if self.kings & dst:
+            self.kings ^= src | dst
+
+        if abs(nx - x) == 2:
+            m = geo.index[(x + nx) // 2][(y + ny) // 2]
+            mid = 1 << m
+            self.hash ^= geo.zobrist[m][removed]
+            self.pieces += 1
+            if removed % 2 == self.WHITE:
+                self.white |= mid
+            else:
+                self.black |= mid
+            if removed > 2:
+                self.kings |= mid
@@ -0,0 +1,157 @@
+"""Opening book.
+
+Built from self-played games (the JSON lines written by arena.py): every
+position of the first plies is keyed by its zobrist hash and side to move,
+and every move played from it is weighted by the results it got (2 per
+win, 1 per draw for the side that played it).
+
+    python arena.py --games 10000 --workers 16 > games.jsonl
+    python book.py --games games.jsonl --plies 12 --out opening.book
+
+File layout (little endian): magic, version, board size, number of
+records, then the records sorted by key: (key, x, y, nx, ny, weight).
+"""
+import argparse
+import json
+import mmap
+import random
+import struct
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from Algo import Checkers
+from transposition import TURN
+
+MAGIC = b"CKBK"
+VERSION = 1
+HEADER = struct.Struct("<4sBBQ")
+RECORD = struct.Struct("<QBBBBI")
+
+Move = Tuple[int, int, int, int]
+
+
+def bookKey(game: Checkers, player: int) -> int:
+    """Key of the current position of a game with player to move"""
+    return game.hash ^ TURN[player]
+
+
+class BookBuilder(object):
+    """
+    Gathers move statistics of the first plies of many games.
+    """
+
+    def __init__(self, size: int = 8, plies: int = 12):
+        self.size = size
+        self.plies = plies
+        # key -> move -> weight
+        self.stats: Dict[int, Dict[Move, int]] = defaultdict(lambda: defaultdict(int))
+
+    def addGame(self, record: Dict):
+        """Add an arena game record (moves played from the initial position, black first)"""
+        game = Checkers(self.size)
+        player = Checkers.BLACK
+        for turn in record["moves"][:self.plies]:
+            result = record["result"]
+            if result == "draw":
+                weight = 1
+            elif (result == "white") == (player == Checkers.WHITE):
+                weight = 2
+            else:
+                weight = 0
+            self.stats[bookKey(game, player)][tuple(turn[0])] += weight
+            for x, y, nx, ny in turn:
+                game.playMove(x, y, nx, ny)
+            player = 1 - player
+
+    def addGames(self, lines: Iterable[str]):
+        """Add the games of arena.py JSON lines"""
+        for line in lines:
+            if line.strip():
+                self.addGame(json.loads(line))
+
+    def write(self, path: str, minWeight: int = 1):
+        """Write the book, dropping moves weighing less than minWeight"""
+        records = sorted((key, move, weight) for key, moves in self.stats.items()
+            for move, weight in moves.items() if weight >= minWeight)
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.size, len(records)))
+            for key, move, weight in records:
+                f.write(RECORD.pack(key, *move, weight))
+
+
+class OpeningBook(object):
+    """
+    Read-only opening book file, memory-mapped, searched by binary search.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an opening book file")
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def _key(self, i: int) -> int:
+        return struct.unpack_from("<Q", self.data, HEADER.size + i * RECORD.size)[0]
+
+    def lookup(self, key: int) -> List[Tuple[Move, int]]:
+        """Get the book moves of a position
+
+        :param: key: the position key (see bookKey)
+        :return: list of ((x, y, nx, ny), weight)
+        """
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        moves = []
+        while lo < self.count:
+            k, x, y, nx, ny, weight = RECORD.unpack_from(self.data, HEADER.size + lo * RECORD.size)
+            if k != key:
+                break
+            moves.append(((x, y, nx, ny), weight))
+            lo += 1
+        return moves
+
+    def choose(self, game: Checkers, player: int, moves) -> Optional[Move]:
+        """Pick a book move at random, weighted by its results
+
+        :param: game: the game ; player: the side to move ; moves: its legal paths
+        :return: the first step (x, y, nx, ny) of the turn, or None if the position is not in the book
+        """
+        legal = {path[0] + path[1] for path in moves}
+        candidates = [(move, weight) for move, weight in self.lookup(bookKey(game, player))
+            if move in legal and weight > 0]
+        if not candidates:
+            return None
+        return random.choices([move for move, _ in candidates], [weight for _, weight in candidates])[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build an opening book from arena.py games")
+    parser.add_argument("--games", default="-", help="JSON lines file of games (- for stdin)")
+    parser.add_argument("--plies", type=int, default=12)
+    parser.add_argument("--size", type=int, default=8)
+    parser.add_argument("--min-weight", type=int, default=1)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args(argv)
+    builder = BookBuilder(args.size, args.plies)
+    if args.games == "-":
+        builder.addGames(sys.stdin)
+    else:
+        with open(args.games) as f:
+            builder.addGames(f)
+    builder.write(args.out, args.min_weight)
+
+
+if __name__ == "__main__":
+    main()
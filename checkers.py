@@ -1,47 +1,141 @@
+import os
+import queue
+import threading
+from collections import Counter
 import tkinter as tk
 from tkinter import messagebox
 from PIL import ImageTk, Image
 from Algo import Checkers,Poss
+from book import OpeningBook
+from tablebase import Tablebase
+
+class EngineThread(threading.Thread):
+    """Run minimaxPlay off the Tk thread, the result is put on a queue polled by APP"""
+
+    def __init__(self, game, player, maxDepth, evaluate, results):
+        super().__init__(daemon=True)
+        self.game = game
+        self.player = player
+        self.maxDepth = maxDepth
+        self.evaluate = evaluate
+        self.results = results
+        self.cancelled = False
+        # (cont, reset) of minimaxPlay once the search is done, also kept for a ponder
+        # search that finishes before the human plays the expected move
+        self.result = None
+
+    def run(self):
+        cont, reset = self.game.minimaxPlay(self.player, maxDepth=self.maxDepth, evaluate=self.evaluate,
+            enablePrint=False, timeLimit=TIME_LIMIT)
+        self.result = (cont, reset)
+        self.results.put((self, cont, reset))
+
+    def cancel(self):
+        self.cancelled = True
+        self.game.stop()
+
+
+class BoardView(object):
+    """
+    The board drawn on a single Canvas.
+
+    Every square has a background, a piece image and a highlight frame item
+    made once; draw() and highlight() compare with what is on the screen and
+    only reconfigure the squares that changed.
+    """
+
+    def __init__(self, master, size: int, onClick):
+        """
+        :param: master: the parent widget ; size: size of the board
+            onClick: called with (x, y) of a clicked square
+        """
+        self.size = size
+        self.onClick = onClick
+        self.canvas = tk.Canvas(master=master, width=size*IMG_SIZE, height=size*IMG_SIZE, highlightthickness=0)
+        self.canvas.pack()
+        self.canvas.bind("<Button-1>", self.click)
+        self.pieces = [[None]*size for _ in range(size)]
+        self.frames = [[None]*size for _ in range(size)]
+        for i in range(size):
+            for j in range(size):
+                left, top = j*IMG_SIZE, i*IMG_SIZE
+                color = 'Sienna' if (i + j) % 2 == 1 else 'Moccasin'
+                self.canvas.create_rectangle(left, top, left+IMG_SIZE, top+IMG_SIZE, fill=color, width=0)
+                self.pieces[i][j] = self.canvas.create_image(left, top, anchor=tk.NW, state=tk.HIDDEN)
+                self.frames[i][j] = self.canvas.create_rectangle(left+2, top+2, left+IMG_SIZE-1, top+IMG_SIZE-1,
+                    outline="", width=3)
+        # what is on the screen: the piece of every square, the highlighted squares
+        self.drawn = [[0]*size for _ in range(size)]
+        self.highlighted = set()
+
+    def click(self, event):
+        x, y = event.y // IMG_SIZE, event.x // IMG_SIZE
+        if 0 <= x < self.size and 0 <= y < self.size:
+            self.onClick(x, y)
+
+    def draw(self, board):
+        """Show a board, redrawing the squares whose piece changed"""
+        drawn = self.drawn
+        for i in range(self.size):
+            row = board[i]
+            for j in range(self.size):
+                piece = row[j]
+                if piece != drawn[i][j]:
+                    if piece == 0:
+                        self.canvas.itemconfig(self.pieces[i][j], state=tk.HIDDEN)
+                    else:
+                        self.canvas.itemconfig(self.pieces[i][j], image=PIECE_IMAGES[piece], state=tk.NORMAL)
+                    drawn[i][j] = piece
+
+    def highlight(self, poss: Poss):
+        """Highlight exactly the given squares"""
+        squares = set(poss)
+        for x, y in self.highlighted - squares:
+            self.canvas.itemconfig(self.frames[x][y], outline="")
+        for x, y in squares - self.highlighted:
+            self.canvas.itemconfig(self.frames[x][y], outline="royalblue")
+        self.highlighted = squares
+
 
 class APP:
     
     def __init__(self):
         super().__init__()
-        self.game = Checkers(CHECKER_SIZE)
-        self.pre = [self.game.getBoard()]
-        self.prePtr = 0
+        self.game = BACKEND(CHECKER_SIZE)
+        self.game.enableQuiescence(QUIESCENCE)
+        if TABLEBASE is not None:
+            self.game.useTablebase(Tablebase(TABLEBASE))
+        if OPENING_BOOK is not None:
+            self.game.useBook(OpeningBook(OPENING_BOOK))
+        if SEARCH_CACHE is not None and os.path.exists(SEARCH_CACHE):
+            self.game.tt.load(SEARCH_CACHE)
         self.maxDepth =  MAX_DEPTH.get()
         self.player = STARTING_PLAYER
-        if self.player == Checkers.WHITE:
-            
-            self.game.minimaxPlay(1-self.player, maxDepth=self.maxDepth, evaluate=EVALUATION_FUNCTION, enablePrint=False)
-            
-            self.pre = [self.game.getBoard()]
-        
+        # the engine plays black, it opens once the window is up
+        engineOpens = self.player == Checkers.WHITE
+
         self.lastX = None
         self.lastY = None
         self.willCapture = False
         self.cnt = 0
-        self.btn = [[None]*self.game.size for _ in range(self.game.size)]
+        # positions with the human to move, as snapshots, for undo/redo
+        self.pre = [] if engineOpens else [self.game.snapshot(self.player, self.cnt)]
+        self.prePtr = len(self.pre) - 1
+        # engine search running in the background, and its results
+        self.engine = None
+        self.results = queue.Queue()
+        # pondering: search on a copy of the game after the expected human move
+        self.ponder = None
+        self.ponderMove = None
+        self.turn = []
 
         menubar = tk.Menu(master=window)
         menubar.add_command(label="Rules", command=self.showRules)
+        menubar.add_command(label="Undo", command=self.undo)
+        menubar.add_command(label="Redo", command=self.redo)
         window.config(menu=menubar)
 
-        brd_fm = tk.Frame(master=window)
-        brd_fm.pack(fill=tk.BOTH, expand=True)
-        for i in range(self.game.size):
-            brd_fm.columnconfigure(i, weight=1, minsize=IMG_SIZE)
-            brd_fm.rowconfigure(i, weight=1, minsize=IMG_SIZE)
-
-            for j in range(self.game.size):
-                frame = tk.Frame(master=brd_fm)
-                frame.grid(row=i, column=j, sticky="nsew")
-
-                self.btn[i][j] = tk.Button(master=frame, width=IMG_SIZE, height=IMG_SIZE, relief=tk.FLAT)
-                self.btn[i][j].bind("<Button-1>", self.click)
-                self.btn[i][j].pack(expand=True, fill=tk.BOTH)
-                
+        self.view = BoardView(window, self.game.size, self.click)
 
         opts_fm = tk.Frame(master=window)
         opts_fm.pack(expand=True)
@@ -56,53 +150,40 @@ class APP:
         self.lbl_counter.pack()
         
         self.update()
-        nextPoss = [move[0] for move in self.game.nextMoves(self.player)]
-        self.hints(nextPoss)
+        if engineOpens:
+            # off the Tk thread like every engine move, engineDone shows it
+            evaluate = self.engineSettings(self.cnt)
+            self.engine = EngineThread(self.game, 1-self.player, self.maxDepth, evaluate, self.results)
+            self.engine.start()
+        else:
+            nextPoss = [move[0] for move in self.game.nextMoves(self.player)]
+            self.hints(nextPoss)
+            self.startPonder()
         
+        window.after(POLL_MS, self.poll)
         window.mainloop()
 
+        if SEARCH_CACHE is not None:
+            self.stopPonder()
+            if self.engine is not None:
+                self.engine.cancel()
+            self.game.tt.save(SEARCH_CACHE)
+
     def showRules(self):
         """ Show rules of checkers"""
         messagebox.showinfo("Rules","Click to select a piece, and click a position to move piece.\n You can find rules here: 'https://www.ultraboardgames.com/checkers/game-rules.php'")
 
     def update(self):
-        for i in range(self.game.size):
-            f = i % 2 == 1
-            for j in range(self.game.size):
-
-                if f:
-                    self.btn[i][j]['bg'] = 'Sienna'
-                else:
-                    self.btn[i][j]['bg'] = 'Moccasin'
-                img = blank_img
-                if self.game.board[i][j] == Checkers.BLACK_MAN:
-                    img = b_man_img
-                elif self.game.board[i][j] == Checkers.BLACK_KING:
-                    img = b_king_img
-                elif self.game.board[i][j] == Checkers.WHITE_MAN:
-                    img = w_man_img
-                elif self.game.board[i][j] == Checkers.WHITE_KING:
-                    img = w_king_img
-
-                self.btn[i][j]["image"] = img
-                
-                f = not f
+        self.view.draw(self.game.board)
         self.lbl_counter['text'] = f'No capture moves: {self.cnt}'
-        window.update()
 
     def hints(self, poss: Poss):
-        for x in range(self.game.size):
-            for y in range(self.game.size):
-                defaultbg = self.btn[x][y].cget('bg')
-                self.btn[x][y].master.config(highlightbackground=defaultbg, highlightthickness=3)
-
-        for pos in poss:
-            x, y = pos
-            self.btn[x][y].master.config(highlightbackground="royalblue", highlightthickness=3)
+        self.view.highlight(poss)
 
-    def click(self, event):
-        info = event.widget.master.grid_info()
-        x, y = info["row"], info["column"]
+    def click(self, x: int, y: int):
+        if self.engine is not None:
+            # the engine is moving
+            return
         if self.lastX == None or self.lastY == None:
             moves = self.game.nextMoves(self.player)
             found = (x, y) in [move[0] for move in moves]
@@ -129,6 +210,7 @@ class APP:
             return
 
         canCapture, removed, _ = self.game.playMove(self.lastX, self.lastY, x, y)
+        self.turn.append((self.lastX, self.lastY, x, y))
         self.hints([])
         self.update()
         self.cnt += 1
@@ -153,19 +235,59 @@ class APP:
                 self.hints(nextCaptures)
                 return
         
-        cont, reset = True, False
-            
+        turn = self.turn
+        self.turn = []
+        evaluate = self.engineSettings(self.cnt)
+        ponder = self.ponder
+        if ponder is not None and turn == self.ponderMove and (ponder.evaluate, ponder.maxDepth) == (evaluate, self.maxDepth):
+            # the expected move: the pondering search becomes the engine's search
+            self.engine = ponder
+            self.ponder = None
+            if ponder.result is not None:
+                # already done, its result was picked up by poll while it was a ponder search
+                self.engineFinished(ponder, *ponder.result)
+            return
+        self.stopPonder()
+
+        self.engine = EngineThread(self.game, 1-self.player, self.maxDepth, evaluate, self.results)
+        self.engine.start()
+
+    def engineSettings(self, cnt):
+        """Get the evaluation function (and set the depth) of the engine after cnt moves without capture"""
         evaluate = EVALUATION_FUNCTION
-        if self.cnt > 20:
+        if cnt > 20:
             evaluate = Checkers.endGame
             if INCREASE_DEPTH:
                 self.maxDepth = 7
         else:
             evaluate = Checkers.evaluate2
             self.maxDepth = MAX_DEPTH.get()
-                    
-        cont, reset = self.game.minimaxPlay(1-self.player, maxDepth=self.maxDepth, evaluate=evaluate, enablePrint=False)
-            
+        return evaluate
+
+    def poll(self):
+        """Pick up finished engine searches on the Tk thread"""
+        try:
+            while True:
+                engine, cont, reset = self.results.get_nowait()
+                if engine is self.engine:
+                    self.engineFinished(engine, cont, reset)
+        except queue.Empty:
+            pass
+        window.after(POLL_MS, self.poll)
+
+    def engineFinished(self, engine, cont, reset):
+        """Take the move of the engine's finished search"""
+        self.engine = None
+        if engine.game is not self.game:
+            # pondered search: replay its move on the game
+            for step in engine.game.lastMove:
+                self.game.playMove(*step)
+            self.game.lastMove = engine.game.lastMove
+            self.game.stateCounter = engine.game.stateCounter
+        self.engineDone(cont, reset)
+
+    def engineDone(self, cont, reset):
+        """Show the engine's move and check for the end of the game"""
         self.cnt += 1
         if not cont:
             messagebox.showinfo(message="You Won!", title="Checkers")
@@ -186,10 +308,64 @@ class APP:
             window.destroy()
 
         self.pre = self.pre[:self.prePtr+1]
-        self.pre.append(self.game.getBoard())
+        self.pre.append(self.game.snapshot(self.player, self.cnt))
         self.prePtr += 1
+        self.startPonder()
+
+    def undo(self):
+        """Go back to the previous position with the human to move"""
+        if self.prePtr > 0:
+            self.goTo(self.prePtr - 1)
+
+    def redo(self):
+        if self.prePtr < len(self.pre) - 1:
+            self.goTo(self.prePtr + 1)
+
+    def goTo(self, index: int):
+        """Restore the position pre[index]"""
+        if self.engine is not None:
+            return
+        self.stopPonder()
+        self.prePtr = index
+        _, self.cnt = self.game.restore(self.pre[index])
+        self.game.resetHistory()
+        self.lastX = None
+        self.lastY = None
+        self.willCapture = False
+        self.turn = []
+        self.update()
+        nextPoss = [move[0] for move in self.game.nextMoves(self.player)]
+        self.hints(nextPoss)
+        self.startPonder()
+
+    def startPonder(self):
+        """Search the engine's answer to the expected human move while the human thinks"""
+        if not PONDER:
+            return
+        path = self.game.expectedMove(self.player, 1-self.player)
+        if path is None or path not in self.game.nextPaths(self.player):
+            return
+
+        game = BACKEND(CHECKER_SIZE)
+        game.setBoard(self.game.board)
+        game.enableQuiescence(QUIESCENCE)
+        game.useTablebase(self.game.tablebase)
+        game.useBook(self.game.book)
+        game.tt = self.game.tt
+        game.stateCounter = Counter(self.game.stateCounter)
+        steps = game.playPath(path)
+        cnt = 0 if any(removed != 0 for removed, _ in steps) else self.cnt + 1
 
+        evaluate = self.engineSettings(cnt)
+        # the steps the human has to click
+        self.ponderMove = [(x, y, nx, ny) for (x, y), (nx, ny) in zip(path, path[1:])]
+        self.ponder = EngineThread(game, 1-self.player, self.maxDepth, evaluate, self.results)
+        self.ponder.start()
 
+    def stopPonder(self):
+        if self.ponder is not None:
+            self.ponder.cancel()
+            self.ponder = None
 
 
 window = tk.Tk()
@@ -199,14 +375,31 @@ b_man_img = ImageTk.PhotoImage(Image.open('pics/b_man.png').resize((IMG_SIZE, IM
 b_king_img = ImageTk.PhotoImage(Image.open('pics/b_king.png').resize((IMG_SIZE, IMG_SIZE)))
 w_man_img = ImageTk.PhotoImage(Image.open('pics/w_man.png').resize((IMG_SIZE, IMG_SIZE)))
 w_king_img = ImageTk.PhotoImage(Image.open('pics/w_king.png').resize((IMG_SIZE, IMG_SIZE)))
-blank_img = ImageTk.PhotoImage(Image.open('pics/blank.png').resize((IMG_SIZE, IMG_SIZE)))
+PIECE_IMAGES = {Checkers.BLACK_MAN: b_man_img, Checkers.BLACK_KING: b_king_img,
+    Checkers.WHITE_MAN: w_man_img, Checkers.WHITE_KING: w_king_img}
 
 
 CHECKER_SIZE = 8
+# board representation: Checkers (list of lists) or bitboard.BitCheckers (bitmasks)
+BACKEND = Checkers
+# follow captures past the max depth before evaluating
+QUIESCENCE = True
+# endgame tablebase file built by tablebase.py (None: no tablebase)
+TABLEBASE = None
+# opening book file built by book.py (None: no book)
+OPENING_BOOK = None
+# search cache file, loaded at start and saved on exit so the next game starts warm (None: no file)
+SEARCH_CACHE = None
 STARTING_PLAYER = Checkers.BLACK
 
 MAX_DEPTH = tk.IntVar()
 
 EVALUATION_FUNCTION = Checkers.evaluate2
 INCREASE_DEPTH = False
+# seconds per engine move, searched with iterative deepening (None: fixed depth)
+TIME_LIMIT = None
+# search the answer to the expected move while the human is thinking
+PONDER = True
+# how often (ms) the Tk thread checks for a finished engine search
+POLL_MS = 20
 APP()
\ No newline at end of file
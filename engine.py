@@ -0,0 +1,351 @@
+"""Engine protocol over stdin/stdout or TCP.
+
+Line-based commands, one answer line per command unless noted:
+
+    isready                               -> readyok
+    position startpos [moves 11-15 ...]   set the position (FEN/PDN notation, see pdn.py)
+    position fen <FEN> [moves ...]
+    play <move>                           play a move on the current position
+    fen                                   -> fen <FEN>
+    go [depth N] [time SECONDS] [eval evaluate2|endGame] [quiescence on|off]
+                                          -> info depth D score S nodes N time T, then bestmove <move>
+                                             (bestmove none when the side to move has lost)
+    stop                                  stop the search, it answers with the last completed depth
+    stats                                 -> stats <JSON of the last search>
+    quit
+
+    python engine.py                      one session on stdin/stdout
+    python engine.py --serve 7070 --workers 8 --cache warm.tt
+
+Searches run on a shared process pool. The transposition tables live in the
+workers and are shared by every session whose search lands there: entries
+depend on the position and the search settings (one table per search context,
+see Checkers.searchContext); a session's history only adds the positions a
+search scores as repetitions. With --cache, every table starts from a search
+cache file (TranspositionTable.save) of the same context.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from Algo import Checkers
+from bitboard import BitCheckers
+from pdn import fromFEN, moveText, parseMove, toFEN
+from tablebase import Tablebase
+from transposition import TranspositionTable
+
+BACKENDS = {"list": Checkers, "bitboard": BitCheckers}
+EVALUATIONS = {"evaluate2": Checkers.evaluate2, "endGame": Checkers.endGame}
+
+# searches that can run at once, each one has a stop flag shared with the workers
+MAX_SEARCHES = 1024
+# how often (seconds) a worker looks at the stop flag of its search
+STOP_POLL = 0.01
+
+# state of a worker process
+_stopFlags = None
+_cache = None
+_games: Dict[Tuple[type, int], Checkers] = {}
+_tables: Dict[Tuple, TranspositionTable] = {}
+_tablebases: Dict[str, Tablebase] = {}
+
+
+def _initWorker(stopFlags, cache):
+    global _stopFlags, _cache
+    _stopFlags = stopFlags
+    _cache = cache
+
+
+def _search(slot: int, backend: str, size: int, packed: bytes, player: int, history: Dict[int, int],
+    evaluate: str, maxDepth: int, timeLimit: Optional[float], quiescence: bool, tablebase: Optional[str]) -> Dict:
+    """Worker task: search a position with iterative deepening until maxDepth, the time
+    limit or the stop flag of the slot
+
+    :return: dict: move (path or None), score, depth, nodes, qnodes, time
+    """
+    cls = BACKENDS[backend]
+    game = _games.get((cls, size))
+    if game is None:
+        game = _games[(cls, size)] = cls(size)
+    if tablebase is not None and tablebase not in _tablebases:
+        _tablebases[tablebase] = Tablebase(tablebase)
+    game.useTablebase(_tablebases.get(tablebase))
+    game.enableQuiescence(quiescence)
+    game.unpack(packed)
+    game.stateCounter = Counter(history)
+    function = EVALUATIONS[evaluate]
+    context = game.searchContext(function)
+    if context not in _tables:
+        table = _tables[context] = TranspositionTable(Checkers.TT_BITS, Checkers.TT_MAX_AGE)
+        if _cache is not None:
+            # a cache of another context is cleared by newSearch
+            table.load(_cache)
+    game.tt = _tables[context]
+    game.tt.newSearch(context)
+    game.ordering.newSearch()
+    game.nodes = game.qnodes = 0
+
+    paths = game.nextPaths(player)
+    if len(paths) == 0:
+        return {"move": None, "score": None, "depth": 0, "nodes": 0, "qnodes": 0, "time": 0.0}
+
+    done = threading.Event()
+
+    def watch():
+        while not done.wait(STOP_POLL):
+            if _stopFlags[slot]:
+                game.stop()
+                return
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    started = time.perf_counter()
+    watcher.start()
+    try:
+        score, path, depth = game.iterativeDeepening(player, paths,
+            float("inf") if timeLimit is None else timeLimit, function, maxDepth)
+    finally:
+        done.set()
+        watcher.join()
+        game.stopped = False
+    return {"move": path, "score": score, "depth": depth, "nodes": game.nodes, "qnodes": game.qnodes,
+        "time": time.perf_counter() - started}
+
+
+class Engine(object):
+    """
+    The process pool and stop flags shared by every session.
+    """
+
+    def __init__(self, workers: int = 1, backend: str = "list", tablebase: Optional[str] = None,
+        cache: Optional[str] = None):
+        self.backend = backend
+        self.tablebase = tablebase
+        # spawned, not forked: a forked worker could inherit the stdin lock held by the reading thread
+        context = multiprocessing.get_context("spawn")
+        self.stopFlags = context.Array('b', MAX_SEARCHES)
+        self.freeSlots = list(range(MAX_SEARCHES))
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_initWorker,
+            initargs=(self.stopFlags, cache))
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    async def search(self, session: "Session", slot: int, **settings) -> Dict:
+        """Search the position of a session on the pool, the slot's stop flag stops it"""
+        game = session.game
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _search, slot, self.backend, game.size, game.pack(),
+            session.player, dict(game.stateCounter), settings["evaluate"], settings["depth"], settings["time"],
+            settings["quiescence"], self.tablebase)
+
+    def acquire(self) -> int:
+        if not self.freeSlots:
+            raise ValueError("too many searches")
+        slot = self.freeSlots.pop()
+        self.stopFlags[slot] = 0
+        return slot
+
+    def release(self, slot: int):
+        self.freeSlots.append(slot)
+
+    def stop(self, slot: int):
+        self.stopFlags[slot] = 1
+
+
+def _play(game: Checkers, player: int, move: str) -> int:
+    """Play a move in text notation and count the new position in the game history
+
+    :return: int: the side to move next
+    """
+    path = parseMove(game, player, move)
+    steps = game.playPath(path)
+    game.remember(1 - player, game.irreversible(path, steps))
+    return 1 - player
+
+
+class Session(object):
+    """
+    One front-end: its game, its history of positions and its running search.
+    """
+
+    def __init__(self, engine: Engine, size: int = 8):
+        self.engine = engine
+        self.size = size
+        self.game = BACKENDS[engine.backend](size)
+        self.player = Checkers.BLACK
+        self.game.remember(self.player)
+        self.slot = None
+        self.task = None
+        self.lastSearch = None
+
+    def setPosition(self, fen: Optional[str], moves: List[str]):
+        """Set the position, unchanged if the FEN or a move is invalid"""
+        if fen is None:
+            game, player = BACKENDS[self.engine.backend](self.size), Checkers.BLACK
+        else:
+            game, player = fromFEN(fen, BACKENDS[self.engine.backend], self.size)
+        game.remember(player)
+        for move in moves:
+            player = _play(game, player, move)
+        self.game, self.player = game, player
+
+    def play(self, move: str):
+        self.player = _play(self.game, self.player, move)
+
+    async def command(self, line: str, write) -> bool:
+        """Run one command
+
+        :param: line: the command ; write: callable writing an answer line
+        :return: bool: false on quit
+        """
+        words = line.split()
+        if not words:
+            return True
+        name, args = words[0], words[1:]
+        try:
+            if name == "quit":
+                self.stop()
+                return False
+            if name == "isready":
+                write("readyok")
+            elif name == "stop":
+                self.stop()
+            elif name == "stats":
+                write("stats " + json.dumps(self.lastSearch))
+            elif self.task is not None and name in ("position", "play", "go"):
+                raise ValueError("searching")
+            elif name == "position":
+                moves = args[args.index("moves") + 1:] if "moves" in args else []
+                spec = args[:args.index("moves")] if "moves" in args else args
+                if spec[:1] == ["startpos"]:
+                    self.setPosition(None, moves)
+                elif spec[:1] == ["fen"] and len(spec) == 2:
+                    self.setPosition(spec[1], moves)
+                else:
+                    raise ValueError("position startpos|fen <FEN> [moves ...]")
+            elif name == "play" and len(args) == 1:
+                self.play(args[0])
+            elif name == "fen":
+                write("fen " + toFEN(self.game, self.player))
+            elif name == "go":
+                settings = {"depth": Checkers.MAX_ITERATIVE_DEPTH, "time": None, "evaluate": "evaluate2",
+                    "quiescence": True}
+                if len(args) % 2 == 1:
+                    raise ValueError(f"go: no value for {args[-1]}")
+                for key, value in zip(args[::2], args[1::2]):
+                    if key == "depth":
+                        settings["depth"] = int(value)
+                    elif key == "time":
+                        settings["time"] = float(value)
+                    elif key == "eval" and value in EVALUATIONS:
+                        settings["evaluate"] = value
+                    elif key == "quiescence" and value in ("on", "off"):
+                        settings["quiescence"] = value == "on"
+                    else:
+                        raise ValueError(f"go: bad option {key} {value}")
+                self.slot = self.engine.acquire()
+                self.task = asyncio.ensure_future(self.go(settings, write))
+            else:
+                raise ValueError(f"unknown command: {line.strip()}")
+        except ValueError as e:
+            write(f"error {e}")
+        return True
+
+    async def go(self, settings: Dict, write):
+        try:
+            result = await self.engine.search(self, self.slot, **settings)
+        except Exception as e:
+            write(f"error {e}")
+            return
+        finally:
+            self.engine.release(self.slot)
+            self.slot = None
+            self.task = None
+        path = result.pop("move")
+        result["move"] = None if path is None else moveText(self.size, path)
+        result["settings"] = settings
+        self.lastSearch = result
+        if path is not None:
+            write(f"info depth {result['depth']} score {result['score']} nodes {result['nodes'] + result['qnodes']} "
+                f"time {result['time']:.3f}")
+        write(f"bestmove {result['move'] or 'none'}")
+
+    def stop(self):
+        if self.slot is not None:
+            self.engine.stop(self.slot)
+
+
+async def serveStdio(engine: Engine, size: int):
+    """One session on stdin/stdout"""
+    session = Session(engine, size)
+    loop = asyncio.get_running_loop()
+
+    def write(text):
+        sys.stdout.write(text + "\n")
+        sys.stdout.flush()
+
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line or not await session.command(line, write):
+            break
+    if session.task is not None:
+        await session.task
+
+
+async def serveTCP(engine: Engine, size: int, host: str, port: int):
+    """One session per connection"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session = Session(engine, size)
+
+        def write(text):
+            if not writer.is_closing():
+                writer.write((text + "\n").encode())
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line or not await session.command(line.decode(errors="replace"), write):
+                    break
+                await writer.drain()
+        finally:
+            session.stop()
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checkers engine protocol server")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT", help="serve TCP sessions on this port")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--size", type=int, default=8)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="list")
+    parser.add_argument("--tablebase", default=None, help="endgame tablebase file")
+    parser.add_argument("--cache", default=None, help="search cache file the transposition tables start from")
+    args = parser.parse_args(argv)
+
+    engine = Engine(args.workers, args.backend, args.tablebase, args.cache)
+    try:
+        if args.serve is None:
+            asyncio.run(serveStdio(engine, args.size))
+        else:
+            asyncio.run(serveTCP(engine, args.size, args.host, args.serve))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.shutdown()
+
+
+if __name__ == "__main__":
+    main()
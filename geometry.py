@@ -0,0 +1,139 @@
+from typing import Dict, List, Optional, Tuple
+
+from transposition import zobristTable
+
+Pos = Tuple[int, int]
+
+WHITE = 1
+BLACK = 0
+
+
+class Geometry(object):
+    """
+    Lookup tables of one board size, computed once and shared by every game.
+
+    Only the dark squares are playable, so a board of size n has n*n/2
+    squares, numbered row by row. Square b maps to the bit 1 << b.
+    The bitboard backend works on square numbers, the list backend on the
+    (x, y) tables, so neither walks directions or checks bounds per move.
+    """
+
+    # absolute directions, in the same order as Checkers.DX / Checkers.DY
+    DIRS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+    # direction order used by Checkers.nextPoss for each player:
+    # WHITE walks DX/DY as is, BLACK walks them negated
+    ORDER = {WHITE: (0, 1, 2, 3), BLACK: (3, 2, 1, 0)}
+    REVERSE = (3, 2, 1, 0)
+
+    def __init__(self, size: int):
+        self.size = size
+        self.index = [[-1] * size for _ in range(size)]
+        self.coords = []
+        for x in range(size):
+            for y in range(size):
+                if (x + y) % 2 == 1:
+                    self.index[x][y] = len(self.coords)
+                    self.coords.append((x, y))
+        self.count = len(self.coords)
+        self.full = (1 << self.count) - 1
+
+        # per square and direction: neighbour square, jump landing square (-1 if off board)
+        self.step = [[-1] * 4 for _ in range(self.count)]
+        self.jump = [[-1] * 4 for _ in range(self.count)]
+        # per direction: list of (shift, source mask) pairs, so that
+        # shifting every source mask by its amount moves a set one step
+        self.shifts: List[List[Tuple[int, int]]] = []
+        for d, (dx, dy) in enumerate(self.DIRS):
+            groups: Dict[int, int] = {}
+            for b, (x, y) in enumerate(self.coords):
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < size and 0 <= ny < size:
+                    n = self.index[nx][ny]
+                    self.step[b][d] = n
+                    groups[n - b] = groups.get(n - b, 0) | (1 << b)
+                    jx, jy = nx + dx, ny + dy
+                    if 0 <= jx < size and 0 <= jy < size:
+                        self.jump[b][d] = self.index[jx][jy]
+            self.shifts.append(sorted(groups.items()))
+
+        # the same tables by position, for every cell of the board:
+        # neighbour[x][y][d] is the square next to (x, y) in direction d (the square
+        # a capture jumps over), landing[x][y][d] the square a capture lands on (None if off board)
+        self.neighbour: List[List[List[Optional[Pos]]]] = [[[None] * 4 for _ in range(size)] for _ in range(size)]
+        self.landing: List[List[List[Optional[Pos]]]] = [[[None] * 4 for _ in range(size)] for _ in range(size)]
+        for x in range(size):
+            for y in range(size):
+                for d, (dx, dy) in enumerate(self.DIRS):
+                    if 0 <= x + dx < size and 0 <= y + dy < size:
+                        self.neighbour[x][y][d] = (x + dx, y + dy)
+                        if 0 <= x + 2 * dx < size and 0 <= y + 2 * dy < size:
+                            self.landing[x][y][d] = (x + 2 * dx, y + 2 * dy)
+        # reach[piece][x][y]: (neighbour, landing) of every direction the piece can move in
+        # from (x, y), in nextPoss order, for the neighbours on the board
+        self.reach: List[List[List[List[Tuple[Pos, Optional[Pos]]]]]] = [[]]
+        for piece in range(1, 5):
+            order = self.ORDER[piece % 2] if piece > 2 else self.ORDER[piece % 2][:2]
+            self.reach.append([[[(self.neighbour[x][y][d], self.landing[x][y][d]) for d in order
+                if self.neighbour[x][y][d] is not None] for y in range(size)] for x in range(size)])
+        # threats[b]: (attacker x, y, landing x, y, attacker's x direction) of the squares
+        # that can capture the piece on square b, the vulnerability test of evaluate2
+        self.threats: List[List[Tuple[int, int, int, int, int]]] = []
+        for x, y in self.coords:
+            self.threats.append([(x + dx, y + dy, x - dx, y - dy, dx) for dx, dy in self.DIRS
+                if 0 <= x + dx < size and 0 <= y + dy < size and 0 <= x - dx < size and 0 <= y - dy < size])
+
+        # zobrist keys per square and piece
+        table = zobristTable(size)
+        self.zobrist = [table[x][y] for x, y in self.coords]
+
+        self.whitePromotion = 0
+        self.blackPromotion = 0
+        # the two centre rows, split into the middle box (four centre columns) and the rest
+        self.middleBox = 0
+        self.middleRow = 0
+        # the two squares next to each double corner
+        self.corners = 0
+        half = size / 2
+        cornerSquares = {(0, 1), (1, 0), (size - 1, size - 2), (size - 2, size - 1)}
+        for b, (x, y) in enumerate(self.coords):
+            if x == size - 1:
+                self.whitePromotion |= 1 << b
+            if x == 0:
+                self.blackPromotion |= 1 << b
+            if x == half - 1 or x == half:
+                if half - 2 <= y < half + 2:
+                    self.middleBox |= 1 << b
+                else:
+                    self.middleRow |= 1 << b
+            if (x, y) in cornerSquares:
+                self.corners |= 1 << b
+        # the row a player starts from (and the opponent promotes on)
+        self.backRow = {WHITE: self.blackPromotion, BLACK: self.whitePromotion}
+
+        # squared distance between every two squares, for the end game evaluation
+        self.distance = [[(x - i) ** 2 + (y - j) ** 2 for x, y in self.coords] for i, j in self.coords]
+
+    def shift(self, bb: int, d: int) -> int:
+        """Move every square of a set one step in direction d
+
+        :param: bb: set of squares ; d: absolute direction
+        :return: int: the shifted set, squares falling off the board are dropped
+        """
+        res = 0
+        for s, mask in self.shifts[d]:
+            if s > 0:
+                res |= (bb & mask) << s
+            else:
+                res |= (bb & mask) >> -s
+        return res
+
+
+_geometries: Dict[int, Geometry] = {}
+
+
+def geometry(size: int) -> Geometry:
+    """Get the (cached) geometry tables of a board size"""
+    geo = _geometries.get(size)
+    if geo is None:
+        geo = _geometries[size] = Geometry(size)
+    return geo
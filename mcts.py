@@ -0,0 +1,322 @@
+"""Monte Carlo tree search.
+
+An engine independent of evaluate2/endGame and of minimax: UCT selection
+over whole turns (Checkers.nextPaths), random playouts move by move with
+nextMoves/playMove/undoMove, and statistics backed up as wins, losses and
+draws. Strength grows with the number of playouts, so it trades CPU time
+(and cores, see workers) for strength.
+
+    engine = MCTS(game, workers=4)
+    cont, reset = engine.play(Checkers.BLACK, timeLimit=1.0)
+
+The tree is kept between calls: when the next search starts from a position
+already in it (after the engine's move and the opponent's reply) that
+subtree becomes the new root. `python arena.py --a-algorithm mcts` plays it
+against minimax.
+"""
+import math
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from Algo import Checkers, Path
+from parallel import getPool
+
+# exploration constant of UCT
+EXPLORATION = math.sqrt(2)
+# playouts of a search without a budget
+DEFAULT_ITERATIONS = 1000
+# a playout is adjudicated on material after this many plies
+PLAYOUT_PLIES = 150
+# and drawn after this many plies without capture, like arena.DRAW_MOVES
+PLAYOUT_DRAW_MOVES = 100
+
+# root statistics of a search: (path, visits, wins) of every root move
+RootStats = List[Tuple[Path, int, float]]
+
+
+class Node(object):
+    """
+    A position of the tree, reached by path from its parent.
+    """
+    __slots__ = ("path", "parent", "player", "key", "untried", "children", "visits", "wins")
+
+    def __init__(self, path: Optional[Path], parent: Optional["Node"], player: int, key: int, untried: List[Path]):
+        self.path = path
+        self.parent = parent
+        # the side to move and the hash of the board
+        self.player = player
+        self.key = key
+        # turns not expanded yet
+        self.untried = untried
+        self.children: List["Node"] = []
+        self.visits = 0
+        # playout results for the side that played path: 1 per win, 0.5 per draw
+        self.wins = 0.0
+
+
+class MCTS(object):
+    """
+    Monte Carlo tree search engine of a game.
+
+    With workers > 1 every search runs root-parallel: each process grows its
+    own tree from the position and the root statistics are summed. Worker
+    processes keep their last tree, so consecutive positions of a game
+    landing on the same worker reuse it too.
+    """
+
+    def __init__(self, game: Checkers, exploration: float = EXPLORATION, guided: bool = True,
+        workers: Optional[int] = None, seed: Optional[int] = None):
+        """
+        :param:
+            game: the game to play, searched in place and restored after each playout
+            exploration: UCT exploration constant
+            guided: playouts promote when they can instead of moving purely at random
+            workers: number of processes, see the class documentation. Defaults to None
+            seed: seed of the playouts. Defaults to None
+        """
+        self.game = game
+        self.exploration = exploration
+        self.guided = guided
+        self.workers = workers
+        self.random = random.Random(seed)
+        self.root: Optional[Node] = None
+        self.stopped = False
+        # playouts of the last search
+        self.playouts = 0
+
+    def stop(self):
+        """Stop the running search (from another thread), it returns the best move so far"""
+        self.stopped = True
+
+    def rootFor(self, player: int) -> Node:
+        """Get the root of a search from the current position, reusing the
+        previous tree when the position is one or two turns below its root
+        """
+        game = self.game
+        root = self.root
+        if root is not None:
+            candidates = [root] + root.children + [grandchild for child in root.children for grandchild in child.children]
+            for node in candidates:
+                if node.key == game.hash and node.player == player:
+                    node.parent = None
+                    node.path = None
+                    self.root = node
+                    return node
+        self.root = Node(None, None, player, game.hash, game.nextPaths(player))
+        return self.root
+
+    def search(self, player: int, iterations: Optional[int] = None, timeLimit: Optional[float] = None) -> Path:
+        """Search the current position
+
+        :param:
+            player: the side to move (WHITE, BLACK), it must have a move
+            iterations: number of playouts (split across the workers)
+            timeLimit: seconds to search; without a budget DEFAULT_ITERATIONS playouts are run
+        :return: Path: the most visited turn
+        """
+        if iterations is None and timeLimit is None:
+            iterations = DEFAULT_ITERATIONS
+        if self.workers is not None and self.workers > 1:
+            stats = self.searchParallel(player, iterations, timeLimit)
+        else:
+            stats = self.searchSerial(player, iterations, timeLimit)
+        return max(stats, key=lambda item: item[1])[0]
+
+    def searchSerial(self, player: int, iterations: Optional[int] = None,
+        timeLimit: Optional[float] = None) -> RootStats:
+        """Grow the tree of the current position in this process
+
+        :return: RootStats: the statistics of the root moves
+        """
+        root = self.rootFor(player)
+        deadline = None if timeLimit is None else time.perf_counter() + timeLimit
+        self.stopped = False
+        self.playouts = 0
+        try:
+            while not self.stopped:
+                if iterations is not None and self.playouts >= iterations:
+                    break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                self.iterate(root)
+                self.playouts += 1
+        finally:
+            self.stopped = False
+        if not root.children:
+            # no playout ran, e.g. stopped at once
+            self.iterate(root)
+        return [(child.path, child.visits, child.wins) for child in root.children]
+
+    def searchParallel(self, player: int, iterations: Optional[int] = None,
+        timeLimit: Optional[float] = None) -> RootStats:
+        """Search the current position on the process pool and sum the root statistics
+
+        :return: RootStats: the statistics of the root moves
+        """
+        game = self.game
+        executor, _ = getPool(self.workers)
+        share = None if iterations is None else -(-iterations // self.workers)
+        futures = [executor.submit(_searchWorker, type(game), game.size, game.pack(), player, share, timeLimit,
+            self.exploration, self.guided, self.random.getrandbits(32)) for _ in range(self.workers)]
+        totals: Dict[Path, List] = {}
+        self.playouts = 0
+        for future in futures:
+            stats, playouts = future.result()
+            self.playouts += playouts
+            for path, visits, wins in stats:
+                total = totals.setdefault(path, [0, 0.0])
+                total[0] += visits
+                total[1] += wins
+        # the trees live in the workers
+        self.root = None
+        return [(path, visits, wins) for path, (visits, wins) in totals.items()]
+
+    def iterate(self, root: Node):
+        """One playout: select a leaf with UCT, expand it, play it out and back up the result"""
+        game = self.game
+        node = root
+        played = []
+        while not node.untried and node.children:
+            node = self.select(node)
+            played.append((node.path, game.playPath(node.path)))
+        if node.untried:
+            path = node.untried.pop(self.random.randrange(len(node.untried)))
+            played.append((path, game.playPath(path)))
+            child = Node(path, node, 1 - node.player, game.hash, game.nextPaths(1 - node.player))
+            node.children.append(child)
+            node = child
+        if node.untried or node.children:
+            winner = self.playout(node.player)
+        else:
+            # no move: the side to move has lost
+            winner = 1 - node.player
+        for path, steps in reversed(played):
+            game.undoPath(path, steps)
+
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner != node.player:
+                node.wins += 1
+            node = node.parent
+
+    def select(self, node: Node) -> Node:
+        """Get the child of a node with the highest UCT value"""
+        logVisits = math.log(node.visits)
+        exploration = self.exploration
+        return max(node.children,
+            key=lambda child: child.wins / child.visits + exploration * math.sqrt(logVisits / child.visits))
+
+    def playout(self, player: int) -> Optional[int]:
+        """Play random moves from the current position and take them back
+
+        :param: player: the side to move
+        :return: int|None: the winner (WHITE, BLACK), None for a draw
+        """
+        game = self.game
+        rng = self.random
+        stack = []
+        winner = None
+        quiet = 0
+        try:
+            for _ in range(PLAYOUT_PLIES):
+                moves = game.nextMoves(player)
+                if len(moves) == 0:
+                    winner = 1 - player
+                    break
+                x, y, nx, ny = self.choose(moves, player)
+                canCapture, removed, promoted = game.playMove(x, y, nx, ny)
+                stack.append((x, y, nx, ny, removed, promoted))
+                # a capture sequence goes on with the same piece
+                while canCapture:
+                    captures = game.nextPoss(nx, ny)[1]
+                    if len(captures) == 0:
+                        break
+                    x, y = nx, ny
+                    nx, ny = captures[rng.randrange(len(captures))]
+                    canCapture, removed, promoted = game.playMove(x, y, nx, ny)
+                    stack.append((x, y, nx, ny, removed, promoted))
+                quiet = 0 if removed != 0 else quiet + 1
+                if quiet >= PLAYOUT_DRAW_MOVES:
+                    break
+                player = 1 - player
+            else:
+                winner = self.adjudicate()
+        finally:
+            for x, y, nx, ny, removed, promoted in reversed(stack):
+                game.undoMove(x, y, nx, ny, removed, promoted)
+        return winner
+
+    def choose(self, moves, player: int) -> Tuple[int, int, int, int]:
+        """Pick the first step of a playout turn: at random, or a promotion first when guided"""
+        rng = self.random
+        if self.guided:
+            last = self.game.size - 1 if player == Checkers.WHITE else 0
+            promotions = [(x, y, nx, ny) for (x, y), poss in moves for nx, ny in poss if nx == last]
+            if promotions:
+                # kings already on the last row move along it too
+                game = self.game
+                index = game.geo.index
+                promotions = [move for move in promotions if game.pieceAt(index[move[0]][move[1]]) <= 2]
+                if promotions:
+                    return promotions[rng.randrange(len(promotions))]
+        (x, y), poss = moves[rng.randrange(len(moves))]
+        nx, ny = poss[rng.randrange(len(poss))]
+        return x, y, nx, ny
+
+    def adjudicate(self) -> Optional[int]:
+        """Winner of an unfinished playout: the side with more material, kings counting double"""
+        whiteMen, whiteKings, blackMen, blackKings = self.game.material()
+        material = whiteMen + 2*whiteKings - blackMen - 2*blackKings
+        if material == 0:
+            return None
+        return Checkers.WHITE if material > 0 else Checkers.BLACK
+
+    def play(self, player: int, iterations: Optional[int] = None, timeLimit: Optional[float] = None,
+        enablePrint: bool = False):
+        """Search and play a turn, like Checkers.minimaxPlay
+
+        :param: player: the side to move ; iterations, timeLimit: the budget, see search
+        :return: continue (bool): false if the player has no move.
+                 reset (bool): true when a piece was captured
+        """
+        game = self.game
+        paths = game.nextPaths(player)
+        game.lastMove = []
+        if len(paths) == 0:
+            if enablePrint:
+                print(("WHITE" if player == Checkers.BLACK else "BLACK") + " Player wins")
+            return False, False
+        # a forced move needs no search
+        path = paths[0] if len(paths) == 1 else self.search(player, iterations, timeLimit)
+        steps = game.playPath(path)
+        for (x, y), (nx, ny) in zip(path, path[1:]):
+            game.lastMove.append((x, y, nx, ny))
+            if enablePrint:
+                print(f"Move from ({x}, {y}) to ({nx}, {ny})")
+        if enablePrint:
+            game.printBoard(*path[-1])
+        return True, any(removed != 0 for removed, _ in steps)
+
+
+# state of a worker process: one engine per backend and size, keeping its tree
+_engines: Dict[Tuple[type, int], MCTS] = {}
+
+
+def _searchWorker(cls, size: int, packed: bytes, player: int, iterations: Optional[int],
+    timeLimit: Optional[float], exploration: float, guided: bool, seed: int) -> Tuple[RootStats, int]:
+    """Worker task: grow the tree of a position
+
+    :return: (RootStats, int): the statistics of the root moves and the number of playouts
+    """
+    engine = _engines.get((cls, size))
+    if engine is None:
+        engine = _engines[(cls, size)] = MCTS(cls(size))
+    engine.exploration = exploration
+    engine.guided = guided
+    engine.random.seed(seed)
+    engine.game.unpack(packed)
+    stats = engine.searchSerial(player, iterations, timeLimit)
+    return stats, engine.playouts
@@ -0,0 +1,101 @@
+from typing import List, Optional, Tuple
+
+# a whole turn: the squares visited, see Checkers.nextPaths
+Move = Tuple[Tuple[int, int], ...]
+
+
+class MoveOrdering(object):
+    """
+    Killer-move and history-heuristic move ordering.
+
+    Keeps two killer moves per ply and a history table indexed by the first
+    and last square of a move, both updated on beta cutoffs. Also counts how
+    often the first move searched was the one that caused the cutoff.
+    """
+
+    KILLERS = 2
+    # score bonuses, above any history value
+    TT_BONUS = 1 << 40
+    KILLER_BONUS = 1 << 30
+
+    def __init__(self, size: int = 8):
+        """Create empty tables
+
+        :param: size: size of the checkers board
+        """
+        self.size = size
+        squares = size * size
+        self.history = [[0] * squares for _ in range(squares)]
+        self.killers: List[List[Move]] = []
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+
+    def newSearch(self):
+        """Forget the killers and age the history of the previous search"""
+        self.killers = []
+        for row in self.history:
+            for i, value in enumerate(row):
+                if value:
+                    row[i] = value >> 1
+
+    def clear(self):
+        """Reset every table and counter"""
+        self.__init__(self.size)
+
+    def order(self, moves, ply: Optional[int] = None, first: Optional[Move] = None) -> List[Move]:
+        """Sort moves, best candidates first
+
+        :param:
+            moves: paths as returned by nextPaths
+            ply: the ply of the node, None to skip killers
+            first: a move to search first (e.g. from the transposition table)
+        :return: List[Move]: the moves to search, in order
+        """
+        size = self.size
+        history = self.history
+        killers = self.killers[ply] if ply is not None and ply < len(self.killers) else ()
+        scored = []
+        for move in moves:
+            if move == first:
+                score = self.TT_BONUS
+            elif move in killers:
+                score = self.KILLER_BONUS - killers.index(move)
+            else:
+                (x, y), (nx, ny) = move[0], move[-1]
+                score = history[x * size + y][nx * size + ny]
+            scored.append((score, move))
+        # stable: equal scores keep the order of the given moves
+        scored.sort(key=lambda item: -item[0])
+        return [move for _, move in scored]
+
+    def cutoff(self, move: Move, ply: int, depth: int, index: int):
+        """Record a move that caused a beta cutoff
+
+        :param:
+            move: the path of the move
+            ply: the ply of the node
+            depth: the remaining depth below the node
+            index: the position of the move in the searched order
+        """
+        self.cutoffs += 1
+        if index == 0:
+            self.firstMoveCutoffs += 1
+
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[self.KILLERS:]
+
+        (x, y), (nx, ny) = move[0], move[-1]
+        self.history[x * self.size + y][nx * self.size + ny] += depth * depth
+
+    def firstMoveCutoffRate(self) -> float:
+        """Get the share of beta cutoffs caused by the first move searched
+
+        :return: float: between 0 and 1 (0 if there was no cutoff)
+        """
+        if self.cutoffs == 0:
+            return 0.0
+        return self.firstMoveCutoffs / self.cutoffs
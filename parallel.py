@@ -0,0 +1,227 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from transposition import TURN
+
+# a whole turn: the squares visited, see Checkers.nextPaths
+Move = Tuple[Tuple[int, int], ...]
+
+# root-parallel searches that can run at once on a pool (e.g. from several threads),
+# each one shares its best root score through its own slot
+MAX_SEARCHES = 64
+
+# one pool per worker count, kept alive between searches, and the free slots of each pool
+_pools: Dict[int, Tuple[ProcessPoolExecutor, object]] = {}
+_freeSlots: Dict[int, List[int]] = {}
+_lock = threading.Lock()
+
+# state of a worker process
+_sharedAlphas = None
+_games: Dict[Tuple[type, int], object] = {}
+_tablebases: Dict[str, object] = {}
+
+
+def _initWorker(sharedAlphas):
+    global _sharedAlphas
+    _sharedAlphas = sharedAlphas
+
+
+def getPool(workers: int):
+    """Get the (cached) process pool of a worker count and its shared alphas
+
+    :param: workers: number of worker processes
+    :return: (ProcessPoolExecutor, multiprocessing.Array): the pool, and the best root
+        score of each search slot (see acquireSlot)
+    """
+    with _lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            sharedAlphas = multiprocessing.Array('q', MAX_SEARCHES)
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=(sharedAlphas,))
+            pool = _pools[workers] = (executor, sharedAlphas)
+            _freeSlots[workers] = list(range(MAX_SEARCHES))
+        return pool
+
+
+def acquireSlot(workers: int) -> int:
+    """Reserve the shared alpha slot of a search on the pool of a worker count"""
+    getPool(workers)
+    with _lock:
+        if not _freeSlots[workers]:
+            raise ValueError("too many parallel searches")
+        return _freeSlots[workers].pop()
+
+
+def releaseSlot(workers: int, slot: int):
+    with _lock:
+        _freeSlots[workers].append(slot)
+
+
+def shutdown():
+    """Stop every cached pool"""
+    with _lock:
+        for executor, _ in _pools.values():
+            executor.shutdown()
+        _pools.clear()
+        _freeSlots.clear()
+
+
+class _SharedAlpha(object):
+    """
+    The best root score of a search as seen by a worker: read from the search's
+    slot (see Checkers.sharedAlpha), minus the penalty of the worker's root move.
+    alpha is the highest value read, the bound the search result is relative to.
+    """
+
+    def __init__(self, slot: int, penalty: int):
+        self.slot = slot
+        self.penalty = penalty
+        self.alpha = _sharedAlphas[slot] - penalty
+
+    def __call__(self) -> int:
+        self.alpha = max(self.alpha, _sharedAlphas[self.slot] - self.penalty)
+        return self.alpha
+
+
+def _searchLine(game, search, player: int, maximizer: int, **kwargs) -> int:
+    """Search the position after a root move, a repetition of the line (see Checkers.searchRoot) is a draw"""
+    position = game.hash ^ TURN[player]
+    if position in game.line:
+        return game.DRAW
+    game.line.add(position)
+    try:
+        return search(player, maximizer, **kwargs)
+    finally:
+        game.line.discard(position)
+
+
+def _searchChild(slot: int, cls, size: int, packed: bytes, player: int, maximizer: int, penalty: int,
+    maxDepth: int, evaluate: Callable[[int], int], deadline: Optional[float],
+    tablebase: Optional[str], quiescence: bool, algorithm: str, line: frozenset):
+    """Worker task: search the position after a root move
+
+    The deadline is in time.time() seconds, shared by every process, so a task
+    that waited in the queue only gets what is left of the caller's budget.
+
+    :return: (int, int, bool, int, int): root score, the (highest) alpha it was searched with,
+        stopped, nodes and quiescence nodes visited
+    """
+    game = _games.get((cls, size))
+    if game is None:
+        game = _games[(cls, size)] = cls(size)
+    if tablebase is not None and tablebase not in _tablebases:
+        from tablebase import Tablebase
+        _tablebases[tablebase] = Tablebase(tablebase)
+    game.useTablebase(_tablebases.get(tablebase))
+    game.enableQuiescence(quiescence)
+    game.unpack(packed)
+    game.line = set(line)
+    game.tt.newSearch(game.searchContext(evaluate))
+    game.ordering.newSearch()
+    game.stopped = False
+    game.nodes = 0
+    game.qnodes = 0
+    game.deadline = None if deadline is None else time.perf_counter() + deadline - time.time()
+
+    # start from the best root score found so far by any worker, and follow it during the search
+    bound = _SharedAlpha(slot, penalty)
+    game.sharedAlpha = bound
+    try:
+        search = game.pvs if algorithm == "pvs" else game.minimax
+        value = _searchLine(game, search, player, maximizer, alpha=bound.alpha, maxDepth=maxDepth,
+            evaluate=evaluate)
+    finally:
+        game.deadline = None
+        game.sharedAlpha = None
+    stopped = game.stopped
+    game.stopped = False
+    value += penalty
+    alpha = bound.alpha + penalty
+
+    if value > alpha and not stopped:
+        with _sharedAlphas.get_lock():
+            if value > _sharedAlphas[slot]:
+                _sharedAlphas[slot] = value
+    return value, alpha, stopped, game.nodes, game.qnodes
+
+
+def searchRootParallel(game, player: int, moves: List[Move], maxDepth: int,
+    evaluate: Callable[[int], int], workers: int, algorithm: str = "minimax"):
+    """Score the root moves on a process pool and pick the best one
+
+    Young brothers wait: the first move is searched here to get a bound, the
+    others are sent to the pool as compact board snapshots. Workers share the
+    best root score as alpha through the search's slot, and tighten their
+    window when it improves while they search. The move picked is the one the
+    serial search would pick: the first of the moves with the best score.
+
+    :param:
+        game: the Checkers game at the root
+        player: the type of the player (WHITE, BLACK)
+        moves: the ordered root paths
+        maxDepth: the max depth of the minimax algorithm
+        evaluate: evaluation function
+        workers: number of worker processes
+        algorithm: "minimax" or "pvs", the search of every root move
+    :return: (int, Move): best score and best move
+    """
+    # perf_counter is per process, the workers get the deadline on the wall clock
+    deadline = None if game.deadline is None else time.time() + game.deadline - time.perf_counter()
+    search = game.pvs if algorithm == "pvs" else game.minimax
+
+    # first move: full window, searched locally
+    steps = game.playPath(moves[0])
+    penalty = 2*game.stateValue(player)
+    bestValue = _searchLine(game, search, 1 - player, player, maxDepth=maxDepth, evaluate=evaluate) + penalty
+    game.undoPath(moves[0], steps)
+    if game.stopped or len(moves) == 1:
+        return bestValue, moves[0]
+
+    executor, sharedAlphas = getPool(workers)
+    slot = acquireSlot(workers)
+    try:
+        sharedAlphas[slot] = bestValue
+        futures = []
+        penalties = [penalty]
+        line = frozenset(game.line)
+        for move in moves[1:]:
+            steps = game.playPath(move)
+            penalty = 2*game.stateValue(player)
+            futures.append(executor.submit(_searchChild, slot, type(game), game.size, game.pack(), 1 - player,
+                player, penalty, maxDepth, evaluate, deadline, None if game.tablebase is None else game.tablebase.path,
+                game.quiescence, algorithm, line))
+            penalties.append(penalty)
+            game.undoPath(move, steps)
+
+        # (score, alpha searched with) per move, the score is exact only above that alpha
+        results = [(bestValue, -game.OO)]
+        for future in futures:
+            value, alpha, stopped, nodes, qnodes = future.result()
+            game.nodes += nodes
+            game.qnodes += qnodes
+            if stopped:
+                game.stopped = True
+            results.append((value, alpha))
+    finally:
+        # every task is done with the slot
+        releaseSlot(workers, slot)
+    if game.stopped:
+        return bestValue, moves[0]
+
+    bestValue = max(value for value, alpha in results if value > alpha)
+    best = min(i for i, (value, alpha) in enumerate(results) if value > alpha and value == bestValue)
+    for i in range(best):
+        value, alpha = results[i]
+        if value <= alpha and value >= bestValue:
+            # failed low on a later move's score, it may still tie with it
+            steps = game.playPath(moves[i])
+            value = _searchLine(game, search, 1 - player, player, alpha=bestValue - 1 - penalties[i],
+                maxDepth=maxDepth, evaluate=evaluate) + penalties[i]
+            game.undoPath(moves[i], steps)
+            if value >= bestValue:
+                best = i
+                break
+    return bestValue, moves[best]
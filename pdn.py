@@ -0,0 +1,216 @@
+"""FEN positions and PDN games.
+
+Squares are numbered like in English draughts notation: 1 to size*size/2
+over the playable squares, row by row from black's side, so black starts
+on 1-12 and white on 21-32 on an 8x8 board.
+
+    B:W21,22,23,24,25,26,27,28,29,30,31,32:B1,2,3,4,5,6,7,8,9,10,11,12
+
+is the initial position (side to move, then the white and black pieces,
+K marking kings). Moves are written as their squares joined by "-" for
+a step and "x" for a capture sequence, e.g. 11-15 or 22x15x6.
+"""
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from Algo import Checkers, Path
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+_TAG = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+_MOVE = re.compile(r"\d+(?:[-x]\d+)+")
+
+
+def toSquare(size: int, x: int, y: int) -> int:
+    """Get the number (1-based) of square (x, y)"""
+    return size * size // 2 - ((x * size + y) // 2)
+
+
+def fromSquare(size: int, square: int) -> Tuple[int, int]:
+    """Get the (x, y) position of a square number"""
+    b = size * size // 2 - square
+    if not 0 <= b < size * size // 2:
+        raise ValueError(f"no square {square} on a {size}x{size} board")
+    x = b // (size // 2)
+    y = 2 * (b % (size // 2)) + (1 - x % 2)
+    return x, y
+
+
+def toFEN(game: Checkers, player: int) -> str:
+    """Write the position of a game as FEN
+
+    :param: game: the game ; player: the side to move
+    :return: str: the FEN string
+    """
+    pieces = {Checkers.WHITE: [], Checkers.BLACK: []}
+    board = game.board
+    for x in range(game.size):
+        for y in range(game.size):
+            piece = board[x][y]
+            if piece != 0:
+                pieces[piece % 2].append((toSquare(game.size, x, y), piece > 2))
+    fields = ["W" if player == Checkers.WHITE else "B"]
+    for color, name in ((Checkers.WHITE, "W"), (Checkers.BLACK, "B")):
+        fields.append(name + ",".join(("K" if king else "") + str(square) for square, king in sorted(pieces[color])))
+    return ":".join(fields)
+
+
+def setFEN(game: Checkers, fen: str) -> int:
+    """Set the board of a game from a FEN string
+
+    :param: game: the game, its size must match the position ; fen: the FEN string
+    :return: int: the side to move
+    """
+    fields = fen.strip().rstrip(".").split(":")
+    if len(fields) != 3 or fields[0] not in ("W", "B"):
+        raise ValueError(f"invalid FEN: {fen}")
+    board = [[0] * game.size for _ in range(game.size)]
+    for field in fields[1:]:
+        color = field[:1]
+        if color not in ("W", "B"):
+            raise ValueError(f"invalid FEN: {fen}")
+        for item in filter(None, field[1:].split(",")):
+            king = item.startswith("K")
+            if king:
+                item = item[1:]
+            first, _, last = item.partition("-")
+            for square in range(int(first), int(last or first) + 1):
+                x, y = fromSquare(game.size, square)
+                piece = Checkers.WHITE_MAN if color == "W" else Checkers.BLACK_MAN
+                board[x][y] = piece + 2 if king else piece
+    game.setBoard(board)
+    return Checkers.WHITE if fields[0] == "W" else Checkers.BLACK
+
+
+def fromFEN(fen: str, cls=Checkers, size: int = 8) -> Tuple[Checkers, int]:
+    """Create a game from a FEN string
+
+    :return: (Checkers, int): the game and the side to move
+    """
+    game = cls(size)
+    return game, setFEN(game, fen)
+
+
+def moveText(size: int, path: Path) -> str:
+    """Write a path as a PDN move"""
+    (x, _), (nx, _) = path[0], path[1]
+    separator = "x" if abs(nx - x) == 2 else "-"
+    return separator.join(str(toSquare(size, x, y)) for x, y in path)
+
+
+def parseMove(game: Checkers, player: int, text: str) -> Path:
+    """Find the legal path of a PDN move
+
+    Captures may leave out the intermediate squares (11x27), they are then
+    matched against the legal capture sequences.
+
+    :param: game: the game ; player: the side to move ; text: the move
+    :return: Path: the path
+    """
+    squares = [fromSquare(game.size, int(s)) for s in re.split("[-x]", text)]
+    matches = []
+    for path in game.nextPaths(player):
+        if path[0] != squares[0] or path[-1] != squares[-1]:
+            continue
+        i = 0
+        for square in path:
+            if i < len(squares) and square == squares[i]:
+                i += 1
+        if i == len(squares):
+            matches.append(path)
+    if len(matches) != 1:
+        raise ValueError(f"{'ambiguous' if matches else 'illegal'} move: {text}")
+    return matches[0]
+
+
+class PDNGame(NamedTuple):
+    """A parsed PDN game: its tags, moves as written, and result"""
+    tags: Dict[str, str]
+    moves: List[str]
+    result: str = "*"
+
+    def start(self, cls=Checkers, size: int = 8) -> Tuple[Checkers, int]:
+        """Create the game at its starting position (FEN tag or initial position)
+
+        :return: (Checkers, int): the game and the side to move
+        """
+        if "FEN" in self.tags:
+            return fromFEN(self.tags["FEN"], cls, size)
+        return cls(size), Checkers.BLACK
+
+    def positions(self, cls=Checkers, size: int = 8) -> Iterator[Tuple[Checkers, int, Optional[Path]]]:
+        """Replay the game
+
+        :return: yields (game, side to move, path about to be played) for every
+            position, the game object is shared and moves on after each item;
+            the last position has no path
+        """
+        game, player = self.start(cls, size)
+        for text in self.moves:
+            path = parseMove(game, player, text)
+            yield game, player, path
+            game.playPath(path)
+            player = 1 - player
+        yield game, player, None
+
+
+def parseGames(lines: Iterable[str]) -> Iterator[PDNGame]:
+    """Parse PDN games one at a time, only the current game is kept in memory
+
+    :param: lines: the PDN text, e.g. an open file
+    :return: yields PDNGame
+    """
+    tags: Dict[str, str] = {}
+    moves: List[str] = []
+    result = "*"
+    inMoves = False
+    comment = 0
+    for line in lines:
+        if comment == 0 and line.lstrip().startswith("["):
+            if inMoves:
+                yield PDNGame(tags, moves, result)
+                tags, moves, result, inMoves = {}, [], "*", False
+            for name, value in _TAG.findall(line):
+                tags[name] = value.replace('\\"', '"')
+            continue
+        for token in re.findall(r"\{|\}|[^\s{}]+", line):
+            if token == "{":
+                comment += 1
+            elif token == "}":
+                comment = max(comment - 1, 0)
+            elif comment:
+                continue
+            elif token in RESULTS:
+                result = token
+                inMoves = True
+            else:
+                move = _MOVE.search(token)
+                if move is not None:
+                    moves.append(move.group())
+                    inMoves = True
+    if inMoves or tags:
+        yield PDNGame(tags, moves, result)
+
+
+def writeGame(tags: Dict[str, str], moves: List[str], result: str = "*") -> str:
+    """Write a game as PDN text
+
+    :param: tags: the tag pairs ; moves: PDN moves (see moveText) ; result: the result token
+    :return: str: the game, ending with a blank line
+    """
+    lines = [f'[{name} "{value}"]' for name, value in tags.items()]
+    text = []
+    for i, move in enumerate(moves):
+        if i % 2 == 0:
+            text.append(f"{i // 2 + 1}.")
+        text.append(move)
+    text.append(result)
+    line = ""
+    body = []
+    for token in text:
+        if line and len(line) + len(token) >= 80:
+            body.append(line)
+            line = ""
+        line = f"{line} {token}" if line else token
+    body.append(line)
+    return "\n".join(lines + [""] + body) + "\n\n"
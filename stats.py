@@ -0,0 +1,140 @@
+"""Search instrumentation.
+
+A SearchStats given to Checkers.useStats is filled by every search of the
+game: nodes per depth, leaf evaluations, beta cutoffs and the index of the
+move that caused them, and the time spent in move generation, evaluation
+and playMove/undoMove. Without it the search only pays a `stats is None`
+test per node.
+
+    stats = SearchStats(profiler=cProfile.Profile())
+    game.useStats(stats)
+    game.minimaxPlay(Checkers.BLACK, maxDepth=6, enablePrint=False)
+    print(stats.toJSON())
+    stats.profiler.print_stats("cumulative")
+"""
+import json
+import time
+from collections import Counter
+from typing import Callable, Dict, List
+
+# the timed parts of the search
+TIMED = ("nextMoves", "evaluate", "playMove", "undoMove")
+
+
+class SearchStats(object):
+    """
+    Counters and timers of the searches of one game.
+
+    profiler is anything with enable() and disable() methods, e.g. a
+    cProfile.Profile; it only runs while a search does. Sampling profilers
+    with other method names can be adapted with
+    types.SimpleNamespace(enable=p.start, disable=p.stop).
+    Searches split across processes (workers > 1) only count the root.
+    """
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.clear()
+
+    def clear(self):
+        """Reset every counter"""
+        # nodes visited per ply below the root
+        self.nodesPerDepth: List[int] = []
+        # nodes of the quiescence search (not in nodesPerDepth)
+        self.quiescenceNodes = 0
+        self.cutoffs = 0
+        # index (in the ordered moves) of the move causing each cutoff -> count
+        self.cutoffIndex: Counter = Counter()
+        self.time: Dict[str, float] = {name: 0.0 for name in TIMED}
+        self.calls: Dict[str, int] = {name: 0 for name in TIMED}
+        self.elapsed = 0.0
+        self.searches = 0
+        self._started = None
+
+    def start(self):
+        """Called by the game when a search starts"""
+        self.searches += 1
+        self._started = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stop(self):
+        """Called by the game when a search ends"""
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self._started is not None:
+            self.elapsed += time.perf_counter() - self._started
+            self._started = None
+
+    def node(self, depth: int):
+        nodes = self.nodesPerDepth
+        while len(nodes) <= depth:
+            nodes.append(0)
+        nodes[depth] += 1
+
+    def qnode(self):
+        self.quiescenceNodes += 1
+
+    def cutoff(self, index: int):
+        self.cutoffs += 1
+        self.cutoffIndex[index] += 1
+
+    def timed(self, name: str, function: Callable) -> Callable:
+        """Wrap a function so that its calls are counted and timed under name"""
+        times = self.time
+        calls = self.calls
+        clock = time.perf_counter
+
+        def wrapper(*args):
+            t = clock()
+            try:
+                return function(*args)
+            finally:
+                times[name] += clock() - t
+                calls[name] += 1
+
+        wrapper.__wrapped__ = function
+        return wrapper
+
+    @property
+    def nodes(self) -> int:
+        return sum(self.nodesPerDepth)
+
+    @property
+    def leaves(self) -> int:
+        """Number of leaf evaluations"""
+        return self.calls["evaluate"]
+
+    def branchingFactor(self) -> float:
+        """Effective branching factor: geometric mean of the growth of the nodes from one ply to the next"""
+        nodes = [n for n in self.nodesPerDepth if n]
+        if len(nodes) < 2:
+            return 0.0
+        return (nodes[-1] / nodes[0]) ** (1 / (len(nodes) - 1))
+
+    def nodesPerSecond(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def firstMoveCutoffRate(self) -> float:
+        """Fraction of the cutoffs caused by the first ordered move"""
+        return self.cutoffIndex[0] / self.cutoffs if self.cutoffs else 0.0
+
+    def toDict(self) -> Dict:
+        return {
+            "searches": self.searches,
+            "elapsed": self.elapsed,
+            "nodes": self.nodes,
+            "nodesPerDepth": list(self.nodesPerDepth),
+            "quiescenceNodes": self.quiescenceNodes,
+            "nodesPerSecond": self.nodesPerSecond(),
+            "branchingFactor": self.branchingFactor(),
+            "leaves": self.leaves,
+            "cutoffs": self.cutoffs,
+            "cutoffIndex": {str(i): n for i, n in sorted(self.cutoffIndex.items())},
+            "firstMoveCutoffRate": self.firstMoveCutoffRate(),
+            "time": dict(self.time),
+            "calls": dict(self.calls),
+        }
+
+    def toJSON(self, **kwargs) -> str:
+        return json.dumps(self.toDict(), **kwargs)
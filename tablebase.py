@@ -0,0 +1,400 @@
+"""Endgame tablebases.
+
+Retrograde analysis of every position with up to N pieces, under the
+rules of Checkers (a turn is a whole capture sequence, a side without
+moves loses, the 100-move draw rule is ignored). Each position gets one
+byte: 0 for a draw, otherwise 1 + the number of turns to the end of the
+game with best play; odd distances are wins for the side to move, even
+ones losses.
+
+    python tablebase.py --pieces 3 --out endgame3.tb
+    python tablebase.py --pieces 3 --out endgame3.tb --check 200   # compare with minimax
+
+File layout (little endian): magic, version, board size, max pieces,
+number of tables, then per table (white men, white kings, black men,
+black kings, offset, count), then per table the values of the positions
+with black to move followed by those with white to move.
+"""
+import argparse
+import mmap
+import random
+import struct
+import sys
+from itertools import combinations
+from math import comb
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from Algo import Checkers
+from bitboard import BitCheckers
+
+MAGIC = b"CKTB"
+# 2: men on their promotion row are solved (version 1 left them as draws)
+VERSION = 2
+HEADER = struct.Struct("<4sBBBH")
+ENTRY = struct.Struct("<BBBBQQ")
+
+# results, for the side to move
+DRAW = 0
+WIN = 1
+LOSS = -1
+
+# (white men, white kings, black men, black kings)
+Signature = Tuple[int, int, int, int]
+
+
+def signatures(maxPieces: int) -> List[Signature]:
+    """Get the material signatures with up to maxPieces pieces and both sides present,
+    in the order they have to be solved: fewer pieces first, then fewer men
+    (captures and promotions only lead to signatures earlier in the list)
+    """
+    result = []
+    for total in range(2, maxPieces + 1):
+        for wm in range(total + 1):
+            for wk in range(total + 1 - wm):
+                for bm in range(total + 1 - wm - wk):
+                    bk = total - wm - wk - bm
+                    if wm + wk > 0 and bm + bk > 0:
+                        result.append((wm, wk, bm, bk))
+    result.sort(key=lambda sig: (sum(sig), sig[0] + sig[2], sig))
+    return result
+
+
+def tableSize(sig: Signature, squares: int) -> int:
+    """Number of placements of a signature's pieces on the board"""
+    count = 1
+    used = 0
+    for k in sig:
+        count *= comb(squares - used, k)
+        used += k
+    return count
+
+
+def rank(groups: Sequence[Sequence[int]], squares: int) -> int:
+    """Index of a placement within its signature's table
+
+    :param: groups: the sorted squares of the white men, white kings, black men and
+                black kings ; squares: number of playable squares
+    :return: int: the index, each group ranked among the squares the earlier ones left free
+    """
+    index = 0
+    used: List[int] = []
+    for group in groups:
+        r = 0
+        for i, s in enumerate(group):
+            r += comb(s - sum(1 for u in used if u < s), i + 1)
+        index = index * comb(squares - len(used), len(group)) + r
+        used.extend(group)
+    return index
+
+
+def placements(sig: Signature, squares: int):
+    """Every placement of a signature's pieces, as (white men, white kings, black men,
+    black kings) tuples of squares. Men on their promotion row are included: a man
+    that captures a king there is not promoted
+    """
+    free = list(range(squares))
+    for wMen in combinations(free, sig[0]):
+        rest1 = [s for s in free if s not in wMen]
+        for wKings in combinations(rest1, sig[1]):
+            rest2 = [s for s in rest1 if s not in wKings]
+            for bMen in combinations(rest2, sig[2]):
+                rest3 = [s for s in rest2 if s not in bMen]
+                for bKings in combinations(rest3, sig[3]):
+                    yield wMen, wKings, bMen, bKings
+
+
+def _bits(mask: int) -> List[int]:
+    squares = []
+    while mask:
+        low = mask & -mask
+        squares.append(low.bit_length() - 1)
+        mask ^= low
+    return squares
+
+
+def _groups(white: int, black: int, kings: int):
+    return (_bits(white & ~kings), _bits(white & kings), _bits(black & ~kings), _bits(black & kings))
+
+
+def _turns(game: BitCheckers, player: int) -> List[Tuple[int, int, int]]:
+    """Positions (white, black, kings) after every complete turn of player"""
+    results = []
+    for path in game.nextPaths(player):
+        steps = game.playPath(path)
+        results.append((game.white, game.black, game.kings))
+        game.undoPath(path, steps)
+    return results
+
+
+class Builder(object):
+    """
+    Solves every signature with up to maxPieces pieces.
+
+    Within a signature, positions are resolved by retrograde propagation in
+    increasing distance order; moves into other signatures (captures,
+    promotions) read the already solved tables.
+    """
+
+    def __init__(self, size: int = 8, maxPieces: int = 3):
+        self.size = size
+        self.maxPieces = maxPieces
+        self.game = BitCheckers(size)
+        self.squares = self.game.geo.count
+        # signature -> [values with black to move, values with white to move]
+        self.tables: Dict[Signature, List[bytearray]] = {}
+
+    def value(self, white: int, black: int, kings: int, player: int) -> int:
+        """Stored byte of a position in an already solved table"""
+        if not (white if player == Checkers.WHITE else black):
+            return 1  # no pieces: lost, 0 turns
+        groups = _groups(white, black, kings)
+        sig = tuple(len(g) for g in groups)
+        return self.tables[sig][player][rank(groups, self.squares)]
+
+    def build(self, log=None):
+        """Solve every signature
+
+        :param: log: optional callable receiving progress messages
+        """
+        for sig in signatures(self.maxPieces):
+            self.solve(sig)
+            if log is not None:
+                log(f"{sig}: {tableSize(sig, self.squares)} positions")
+
+    def solve(self, sig: Signature):
+        """Solve one signature, its captures and promotions must be solved already"""
+        game = self.game
+        squares = self.squares
+        count = tableSize(sig, squares)
+        values = [bytearray(count), bytearray(count)]
+
+        # node id = player * count + index
+        successors: Dict[int, List[int]] = {}
+        winAt: Dict[int, int] = {}      # best win distance through other tables
+        lossAt: Dict[int, int] = {}     # longest loss distance of the won successors
+        blocked = set()                 # nodes with a drawn successor in other tables
+        remaining: Dict[int, int] = {}
+        buckets: Dict[int, List[Tuple[int, int]]] = {}
+
+        for placement in placements(sig, squares):
+            index = rank(placement, squares)
+            wMen, wKings, bMen, bKings = placement
+            white = sum(1 << s for s in wMen + wKings)
+            black = sum(1 << s for s in bMen + bKings)
+            kings = sum(1 << s for s in wKings + bKings)
+            for player in (Checkers.BLACK, Checkers.WHITE):
+                node = player * count + index
+                game.white, game.black, game.kings = white, black, kings
+                inside = []
+                lost = None
+                won = 0
+                for w, b, k in _turns(game, player):
+                    groups = _groups(w, b, k)
+                    if tuple(len(g) for g in groups) == sig:
+                        inside.append((1 - player) * count + rank(groups, squares))
+                        continue
+                    v = self.value(w, b, k, 1 - player)
+                    if v == 0:
+                        blocked.add(node)
+                    elif (v - 1) % 2 == 0:
+                        lost = v - 1 if lost is None else min(lost, v - 1)
+                    else:
+                        won = max(won, v - 1)
+                successors[node] = inside
+                remaining[node] = len(inside)
+                if lost is not None:
+                    winAt[node] = lost + 1
+                    buckets.setdefault(lost + 1, []).append((node, WIN))
+                elif not inside and node not in blocked:
+                    # every move leaves this table and wins for the opponent
+                    # (or there is no move at all)
+                    buckets.setdefault(won + 1 if won else 0, []).append((node, LOSS))
+                lossAt[node] = won
+
+        predecessors: Dict[int, List[int]] = {}
+        for node, inside in successors.items():
+            for succ in inside:
+                predecessors.setdefault(succ, []).append(node)
+
+        resolved: Dict[int, int] = {}
+        distance = 0
+        while buckets:
+            if distance not in buckets:
+                distance += 1
+                continue
+            for node, result in buckets.pop(distance):
+                if node in resolved:
+                    continue
+                resolved[node] = distance
+                values[node // count][node % count] = distance + 1
+                for pred in predecessors.get(node, ()):
+                    if pred in resolved:
+                        continue
+                    if result == LOSS:
+                        buckets.setdefault(distance + 1, []).append((pred, WIN))
+                    else:
+                        remaining[pred] -= 1
+                        lossAt[pred] = max(lossAt[pred], distance)
+                        if remaining[pred] == 0 and pred not in blocked and pred not in winAt:
+                            buckets.setdefault(lossAt[pred] + 1, []).append((pred, LOSS))
+            distance += 1
+
+        self.tables[sig] = values
+
+    def write(self, path: str):
+        """Write the solved tables to a tablebase file"""
+        sigs = sorted(self.tables)
+        offset = HEADER.size + ENTRY.size * len(sigs)
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.size, self.maxPieces, len(sigs)))
+            for sig in sigs:
+                count = len(self.tables[sig][0])
+                f.write(ENTRY.pack(*sig, offset, count))
+                offset += 2 * count
+            for sig in sigs:
+                black, white = self.tables[sig]
+                f.write(black)
+                f.write(white)
+
+
+def _bruteForce(game: Checkers, player: int, depth: int, memo: Dict) -> int:
+    """Plain minimax over whole turns, depth turns deep
+
+    :return: WIN or LOSS for the side to move if the game ends within depth turns
+        with best play, DRAW otherwise
+    """
+    key = (game.hash, player, depth)
+    result = memo.get(key)
+    if result is not None:
+        return result
+    paths = game.nextPaths(player)
+    if not paths:
+        result = LOSS
+    elif depth == 0:
+        result = DRAW
+    else:
+        result = LOSS
+        for path in paths:
+            steps = game.playPath(path)
+            result = max(result, -_bruteForce(game, 1 - player, depth - 1, memo))
+            game.undoPath(path, steps)
+            if result == WIN:
+                break
+    memo[key] = result
+    return result
+
+
+def check(builder: Builder, samples: Optional[int] = None, seed: int = 0) -> List[str]:
+    """Compare the solved tables with a plain minimax on the list board
+
+    A win or loss in d turns must be found by a d turns deep search and not by a
+    d - 1 turns deep one, a draw must stay undecided one turn past the longest
+    win of the tables.
+
+    :param: builder: a built Builder ; samples: positions checked per signature
+        (None: all of them) ; seed: seed of the sampling
+    :return: List[str]: the mismatches
+    """
+    game = Checkers(builder.size)
+    rng = random.Random(seed)
+    horizon = max(max(values) for tables in builder.tables.values() for values in tables)
+    memo: Dict = {}
+    mismatches = []
+    names = {LOSS: "loss", DRAW: "draw", WIN: "win"}
+    pieces = (Checkers.WHITE_MAN, Checkers.WHITE_KING, Checkers.BLACK_MAN, Checkers.BLACK_KING)
+    for sig, tables in builder.tables.items():
+        positions = list(placements(sig, builder.squares))
+        if samples is not None and samples < len(positions):
+            positions = rng.sample(positions, samples)
+        for placement in positions:
+            data = bytearray(builder.squares)
+            for piece, group in zip(pieces, placement):
+                for s in group:
+                    data[s] = piece
+            game.unpack(bytes(data))
+            index = rank(placement, builder.squares)
+            for player in (Checkers.BLACK, Checkers.WHITE):
+                v = tables[player][index]
+                if v == 0:
+                    expected, distance = DRAW, horizon
+                else:
+                    expected, distance = (WIN if (v - 1) % 2 == 1 else LOSS), v - 1
+                found = _bruteForce(game, player, distance, memo)
+                if found == expected and 0 < v - 1:
+                    # not decided earlier than the table says
+                    found = expected if _bruteForce(game, player, distance - 1, memo) == DRAW else None
+                if found != expected:
+                    side = "white" if player == Checkers.WHITE else "black"
+                    mismatches.append(f"{sig} {placement} {side} to move: table {names[expected]}"
+                        + (f" in {distance}" if v else "") + ", minimax " + (names[found] if found is not None else "decides it sooner"))
+    return mismatches
+
+
+class Tablebase(object):
+    """
+    Read-only tablebase file, memory-mapped rather than loaded into RAM.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, self.maxPieces, n = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a tablebase file of version {VERSION}")
+        self.squares = self.size * self.size // 2
+        self.tables: Dict[Signature, Tuple[int, int]] = {}
+        for i in range(n):
+            wm, wk, bm, bk, offset, count = ENTRY.unpack_from(self.data, HEADER.size + i * ENTRY.size)
+            self.tables[(wm, wk, bm, bk)] = (offset, count)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def probe(self, game: Checkers, player: int) -> Optional[Tuple[int, int]]:
+        """Look up the current position of a game
+
+        :param: game: the game (of the tablebase's board size) ; player: the side to move
+        :return: (WIN (1)|LOSS (-1)|DRAW (0), turns to the end) for the side to move,
+            None if the position is not in the tablebase
+        """
+        groups = ([], [], [], [])
+        for s, piece in enumerate(game.pack()):
+            if piece:
+                groups[(0 if piece == Checkers.WHITE_MAN else 1 if piece == Checkers.WHITE_KING
+                    else 2 if piece == Checkers.BLACK_MAN else 3)].append(s)
+        sig = tuple(len(g) for g in groups)
+        if sig[0] + sig[1] == 0 or sig[2] + sig[3] == 0:
+            return None
+        table = self.tables.get(sig)
+        if table is None:
+            return None
+        offset, count = table
+        v = self.data[offset + player * count + rank(groups, self.squares)]
+        if v == 0:
+            return DRAW, 0
+        return (WIN if (v - 1) % 2 == 1 else LOSS), v - 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build an endgame tablebase")
+    parser.add_argument("--pieces", type=int, default=3, help="max number of pieces on the board")
+    parser.add_argument("--size", type=int, default=8)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--check", type=int, default=None, metavar="N",
+        help="compare N positions per signature (0: all) with a plain minimax, exit 1 on a mismatch")
+    args = parser.parse_args(argv)
+    builder = Builder(args.size, args.pieces)
+    builder.build(print)
+    builder.write(args.out)
+    if args.check is not None:
+        mismatches = check(builder, args.check or None)
+        for line in mismatches:
+            print(line, file=sys.stderr)
+        print(f"{len(mismatches)} mismatches", file=sys.stderr)
+        sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import json
+import random
+import struct
+from typing import Dict, List, Optional, Tuple
+
+# bound types of a stored score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# fixed seed so that every process (and every run) hashes positions the same way
+ZOBRIST_SEED = 0x5EED
+
+_zobrist: Dict[int, List[List[List[int]]]] = {}
+_rng = random.Random(ZOBRIST_SEED)
+# keys mixed into a position hash for the side to move and the maximizer
+TURN = [_rng.getrandbits(64), _rng.getrandbits(64)]
+MAXIMIZER = [_rng.getrandbits(64), _rng.getrandbits(64)]
+
+
+def zobristTable(size: int) -> List[List[List[int]]]:
+    """Get the (cached) zobrist keys of a board size
+
+    :param: size: size of the checkers board
+    :return: keys[x][y][piece], piece 0 (empty) always maps to 0
+    """
+    table = _zobrist.get(size)
+    if table is None:
+        rng = random.Random(ZOBRIST_SEED + size)
+        table = [[[0] + [rng.getrandbits(64) for _ in range(4)] for _ in range(size)] for _ in range(size)]
+        _zobrist[size] = table
+    return table
+
+
+Entry = Tuple[int, int, int, int, Optional[Tuple[Tuple[int, int], ...]], int]
+
+# search cache file (little endian): magic, version, number of records, length of
+# the context (JSON), the context, then the records: (key, depth, bound, score,
+# age, squares of the move) followed by x, y of every square of the move
+MAGIC = b"CKTT"
+VERSION = 1
+HEADER = struct.Struct("<4sBIH")
+RECORD = struct.Struct("<QBBiBB")
+
+
+class TranspositionTable(object):
+    """
+    Fixed-size transposition table.
+
+    Every slot is a bucket of two entries: the first keeps the deepest
+    search of the current generation, the second is always replaced.
+    An entry is (key, depth, bound, score, move, generation), depth being
+    the remaining search depth below the stored position.
+
+    The table is kept from one search to the next (a search two plies later
+    finds most of its tree there), so its size is its memory cap. With
+    maxAge, entries no search has written for maxAge searches are dropped.
+    save and load keep it across games and processes.
+    """
+
+    def __init__(self, bits: int = 16, maxAge: Optional[int] = None):
+        """Create an empty table
+
+        :param: bits: the table holds 2 ** bits buckets
+            maxAge: searches an entry is kept without being written again. Defaults to None (no limit)
+        """
+        self.mask = (1 << bits) - 1
+        self.entries: List[Optional[Entry]] = [None] * (2 << bits)
+        self.maxAge = maxAge
+        self.generation = 0
+        self.context = None
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self):
+        """Remove every entry"""
+        self.entries = [None] * len(self.entries)
+        self.hits = 0
+        self.stores = 0
+
+    def newSearch(self, context=None):
+        """Start a new search, entries of older searches become replaceable first
+
+        :param: context: what the scores depend on (the evaluation function and
+            search settings), the table is cleared when it changes
+        """
+        if context != self.context:
+            self.clear()
+            self.context = context
+        self.generation += 1
+        if self.maxAge is not None and self.generation % self.maxAge == 0:
+            # one sweep every maxAge searches, entries live between maxAge and 2 * maxAge searches
+            self.prune(self.maxAge)
+
+    def prune(self, maxAge: int) -> int:
+        """Remove the entries no search has written for more than maxAge searches
+
+        :return: int: the number of entries removed
+        """
+        oldest = self.generation - maxAge
+        entries = self.entries
+        removed = 0
+        for i, entry in enumerate(entries):
+            if entry is not None and entry[5] < oldest:
+                entries[i] = None
+                removed += 1
+        return removed
+
+    def probe(self, key: int) -> Optional[Entry]:
+        """Get the entry stored for a key
+
+        :param: key: position hash
+        :return: Entry|None: the stored entry if any
+        """
+        i = (key & self.mask) << 1
+        entry = self.entries[i]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        entry = self.entries[i + 1]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, bound: int, score: int, move=None):
+        """Store a search result
+
+        :param: key: position hash ; depth: remaining search depth
+                bound: EXACT/LOWER/UPPER ; score: the score ; move: best move found
+        """
+        i = (key & self.mask) << 1
+        entries = self.entries
+        first = entries[i]
+        if move is None:
+            # keep the best move of an earlier search of the same position
+            for old in (first, entries[i + 1]):
+                if old is not None and old[0] == key:
+                    move = old[4]
+                    break
+        entry = (key, depth, bound, score, move, self.generation)
+        self.stores += 1
+        if first is None or first[0] == key or first[1] <= depth or first[5] != self.generation:
+            if first is not None and first[0] != key:
+                # the replaced entry still gets a chance in the second slot
+                entries[i + 1] = first
+            entries[i] = entry
+        else:
+            entries[i + 1] = entry
+
+    def save(self, path: str, maxAge: Optional[int] = None):
+        """Write the entries and the context of their scores to a file
+
+        The context must be JSON serialisable, e.g. Checkers.searchContext.
+
+        :param: path: the file ; maxAge: leave out entries older than maxAge searches. Defaults to None
+        """
+        records = []
+        for entry in self.entries:
+            if entry is None:
+                continue
+            key, depth, bound, score, move, generation = entry
+            age = self.generation - generation
+            if maxAge is not None and age > maxAge:
+                continue
+            squares = () if move is None else move
+            record = RECORD.pack(key, depth, bound, score, min(age, 255), len(squares))
+            records.append(record + bytes(c for square in squares for c in square))
+        context = json.dumps(self.context).encode()
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(records), len(context)))
+            f.write(context)
+            for record in records:
+                f.write(record)
+
+    def load(self, path: str):
+        """Replace the entries by those of a file written by save, within this table's size
+
+        The table takes the context of the file: the next newSearch clears it
+        again if its context is another one.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, count, length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a search cache file")
+        offset = HEADER.size
+        context = json.loads(data[offset:offset + length])
+        offset += length
+        self.clear()
+        self.context = tuple(context) if isinstance(context, list) else context
+        records = []
+        for _ in range(count):
+            key, depth, bound, score, age, squares = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            coords = data[offset:offset + 2 * squares]
+            offset += 2 * squares
+            move = tuple(zip(coords[::2], coords[1::2])) if squares else None
+            records.append((age, depth, key, bound, score, move))
+        # oldest first, so that recent and deep entries win the contested slots
+        records.sort(key=lambda record: (-record[0], record[1]))
+        generation = self.generation
+        try:
+            for age, depth, key, bound, score, move in records:
+                self.generation = generation - age
+                self.store(key, depth, bound, score, move)
+        finally:
+            self.generation = generation
+        self.stores = 0
@@ -0,0 +1,205 @@
+"""Texel tuning of the evaluate2 weights.
+
+The quiet positions (no capture for the side to move) of self-played games
+(the JSON lines written by arena.py) are labelled with the result of their
+game, and the weights are fitted so that sigmoid(evaluate2 / scale) predicts
+that result, minimising the logistic loss with Newton steps over the whole
+data set:
+
+    python arena.py --games 10000 --workers 16 > games.jsonl
+    python tune.py --games games.jsonl --data positions.npy --out weights.json
+    python tune.py --data positions.npy                      # refit saved positions
+
+Positions are stored as an (M, len(FEATURES) + 1) int8 .npy array: the
+feature counts of batcheval.evaluate2Features, then the result for that
+side in halves (0 loss, 1 draw, 2 win). Every position gives one row per
+side. The array is memory mapped and read in chunks, so the data set does
+not have to fit in memory. The scale is fitted first with the current
+weights, then the weights with an L2 pull towards the current ones; Algo
+loads the weight file the next time it is imported.
+"""
+import argparse
+import json
+import sys
+from typing import Iterable, Sequence, Tuple
+
+import numpy as np
+
+from Algo import Checkers
+from batcheval import evaluate2Features
+from weights import FEATURES, WEIGHTS_FILE, loadWeights, saveWeights
+
+# rows read at a time
+CHUNK = 1 << 16
+# positions before this ply are mostly the same openings, they are skipped
+SKIP_PLIES = 8
+# newton steps of each fit
+ITERATIONS = 20
+# L2 pull of the weights towards the starting ones (per position, in sigmoid units)
+L2 = 1e-4
+
+
+def quietPositions(lines: Iterable[str], size: int = 8, skip: int = SKIP_PLIES):
+    """Replay arena.py games and collect their quiet positions
+
+    :param: lines: JSON lines of games ; size: size of the board ; skip: plies skipped at the start of a game
+    :return: yields (board, side to move, result for WHITE in halves)
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        result = {"white": 2, "black": 0, "draw": 1}[record["result"]]
+        game = Checkers(size)
+        player = Checkers.BLACK
+        for ply, turn in enumerate(record["moves"]):
+            if ply >= skip:
+                moves = game.nextMoves(player)
+                (x, _), poss = moves[0]
+                if abs(poss[0][0] - x) != 2:
+                    yield game.getBoard(), player, result
+            for x, y, nx, ny in turn:
+                game.playMove(x, y, nx, ny)
+            player = 1 - player
+
+
+def extract(lines: Iterable[str], size: int = 8, skip: int = SKIP_PLIES) -> np.ndarray:
+    """Feature rows of the quiet positions of arena.py games, see the module documentation
+
+    :return: np.ndarray: (M, len(FEATURES) + 1) int8 rows
+    """
+    parts = []
+    boards, results = [], []
+
+    def flush():
+        stacked = np.asarray(boards, dtype=np.int8)
+        white = np.asarray(results, dtype=np.int8)
+        for side, labels in ((Checkers.WHITE, white), (Checkers.BLACK, 2 - white)):
+            rows = np.empty((len(boards), len(FEATURES) + 1), dtype=np.int8)
+            rows[:, :-1] = evaluate2Features(stacked, side)
+            rows[:, -1] = labels
+            parts.append(rows)
+        boards.clear()
+        results.clear()
+
+    for board, _, result in quietPositions(lines, size, skip):
+        boards.append(board)
+        results.append(result)
+        if len(boards) == CHUNK:
+            flush()
+    if boards:
+        flush()
+    if not parts:
+        return np.empty((0, len(FEATURES) + 1), dtype=np.int8)
+    return np.concatenate(parts)
+
+
+def _chunks(data: np.ndarray):
+    """(features, targets) of the data in chunks, features as float64 and targets in [0, 1]"""
+    for start in range(0, len(data), CHUNK):
+        rows = np.asarray(data[start:start + CHUNK], dtype=np.float64)
+        yield rows[:, :-1], rows[:, -1] / 2
+
+
+def _loss(data: np.ndarray, weights: np.ndarray) -> float:
+    """Mean logistic loss of sigmoid(features . weights) against the results"""
+    total = 0.0
+    for X, y in _chunks(data):
+        z = X @ weights
+        # log(1 + e^z) - y z, stable for large |z|
+        total += float((np.logaddexp(0, z) - y * z).sum())
+    return total / len(data)
+
+
+def fitScale(data: np.ndarray, weights: Sequence[int], iterations: int = ITERATIONS) -> float:
+    """Fit the scale of the scores: the score whose sigmoid(score / scale) gives the best predictions
+
+    :return: float: the scale, in evaluate2 units
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    k = 1.0 / 1000
+    for _ in range(iterations):
+        gradient = hessian = 0.0
+        for X, y in _chunks(data):
+            s = X @ weights
+            p = 1 / (1 + np.exp(-k * s))
+            gradient += float(((p - y) * s).sum())
+            hessian += float((p * (1 - p) * s * s).sum())
+        if hessian == 0:
+            break
+        step = gradient / hessian
+        # stay positive
+        k = max(k - step, k / 2)
+        if abs(step) < 1e-9:
+            break
+    return 1 / k
+
+
+def fitWeights(data: np.ndarray, weights: Sequence[int], scale: float, l2: float = L2,
+    iterations: int = ITERATIONS) -> Tuple[np.ndarray, float]:
+    """Fit the weights at a fixed scale (iteratively reweighted least squares)
+
+    :param: data: feature rows ; weights: the starting weights ; scale: see fitScale
+        l2: pull towards the starting weights ; iterations: newton steps
+    :return: (np.ndarray, float): the weights in evaluate2 units, and their mean loss
+    """
+    start = np.asarray(weights, dtype=np.float64) / scale
+    v = start.copy()
+    n = len(data)
+    eye = np.eye(len(v))
+    for _ in range(iterations):
+        gradient = 2 * l2 * n * (v - start)
+        hessian = 2 * l2 * n * eye
+        for X, y in _chunks(data):
+            p = 1 / (1 + np.exp(-(X @ v)))
+            gradient += X.T @ (p - y)
+            hessian += (X * (p * (1 - p))[:, None]).T @ X
+        # vulnerable + protected always equals men + kings: without l2 the hessian is
+        # singular and lstsq takes the smallest step
+        step = np.linalg.lstsq(hessian, gradient, rcond=None)[0]
+        v -= step
+        if np.abs(step).max() < 1e-7:
+            break
+    return v * scale, _loss(data, v)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit the evaluate2 weights on arena.py games")
+    parser.add_argument("--games", default=None, help="JSON lines file of games (- for stdin)")
+    parser.add_argument("--data", default=None, help=".npy file of positions, written when --games is given")
+    parser.add_argument("--out", default=WEIGHTS_FILE, help="weight file to write")
+    parser.add_argument("--size", type=int, default=8)
+    parser.add_argument("--skip", type=int, default=SKIP_PLIES, help="opening plies left out of the data")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--l2", type=float, default=L2)
+    args = parser.parse_args(argv)
+    if args.games is None and args.data is None:
+        parser.error("--games or --data is required")
+
+    if args.games is not None:
+        f = sys.stdin if args.games == "-" else open(args.games)
+        try:
+            data = extract(f, args.size, args.skip)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+        if args.data is not None:
+            np.save(args.data, data)
+    else:
+        data = np.load(args.data, mmap_mode="r")
+    if len(data) == 0:
+        parser.error("no quiet positions")
+
+    start = loadWeights()
+    scale = fitScale(data, start, args.iterations)
+    before = _loss(data, np.asarray(start, dtype=np.float64) / scale)
+    fitted, after = fitWeights(data, start, scale, args.l2, args.iterations)
+    weights = [int(round(w)) for w in fitted]
+    saveWeights(weights, args.out, tuning={"rows": len(data), "scale": round(scale, 1),
+        "lossBefore": round(before, 6), "lossAfter": round(after, 6)})
+    print(json.dumps({"rows": len(data), "scale": scale, "lossBefore": before, "lossAfter": after,
+        "weights": dict(zip(FEATURES, weights))}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
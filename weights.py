@@ -0,0 +1,45 @@
+"""Evaluation weights.
+
+evaluate2 is a weighted sum of the features in FEATURES. The weights are
+read once, when Algo is imported, from WEIGHTS_FILE (weights.json next to
+this module, as written by tune.py) if it exists, and are the hand-tuned
+DEFAULT_WEIGHTS otherwise. Scores must stay integers, so weights are too.
+"""
+import json
+import os
+from typing import Optional, Sequence, Tuple
+
+# features of evaluate2, counted from the maximizer's side (sign = +1 for its pieces, -1 for the opponent's)
+FEATURES = ("men", "kings", "backRow", "middleBox", "middleRow", "vulnerable", "protected")
+DEFAULT_WEIGHTS = (2000, 4000, 400, 250, 50, -300, 300)
+
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights.json")
+
+
+def loadWeights(path: Optional[str] = WEIGHTS_FILE) -> Tuple[int, ...]:
+    """Read the evaluate2 weights of a weight file
+
+    :param: path: the weight file, None or a missing file gives the defaults
+    :return: tuple: one weight per feature of FEATURES, missing ones keep their default
+    """
+    if path is None or not os.path.exists(path):
+        return DEFAULT_WEIGHTS
+    with open(path) as f:
+        values = json.load(f).get("evaluate2", {})
+    unknown = set(values) - set(FEATURES)
+    if unknown:
+        raise ValueError(f"unknown evaluate2 features in {path}: {', '.join(sorted(unknown))}")
+    return tuple(int(values.get(name, default)) for name, default in zip(FEATURES, DEFAULT_WEIGHTS))
+
+
+def saveWeights(weights: Sequence[int], path: str = WEIGHTS_FILE, **info):
+    """Write a weight file
+
+    :param: weights: one weight per feature of FEATURES ; path: the file
+        info: extra fields stored with the weights (e.g. how they were fitted)
+    """
+    data = {"evaluate2": {name: int(weight) for name, weight in zip(FEATURES, weights)}}
+    data.update(info)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")